@@ -2,45 +2,322 @@
 Completed solution for the 'word count' exercise featured within Google's Python
 course.
 
-This script reads the contents of the specified file, and then generates and
-outputs a dictionary of words and associated counts.
+This script reads the contents of the specified file (or files), and then
+generates and outputs a dictionary of words and associated counts. The counting
+can optionally be distributed across a pool of processes, the most frequent
+words can optionally be approximated in memory independent of the vocabulary,
+and the counts can optionally be persisted within an index so that only new or
+changed files are counted by subsequent runs.
 
 Usage:
-    python 05_word_count.py [--all] [--top] <file_path>
+    python 05_word_count.py [--jobs <jobs>] [--approx <counters>] [--index <index_path> [--rebuild]] [--all] [--top [<limit>]] <file_path> [<file_path>]
+
+The file path '-' denotes standard input.
 """
 
 
+import functools
+import heapq
+import multiprocessing
 import os
+import reader
+import sqlite3
+import string
 import sys
+import tokenizer
+
+
+TOP_LIMIT = 20  # Unit in words.
+
+
+class HeavyHitters(object):
+    """
+    Approximates the most frequent words within a stream by using the
+    Space-Saving algorithm, which tracks a fixed number of counters regardless
+    of the vocabulary size. Each counter holds a count which may over-estimate
+    the true count by (at most) the associated error.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counters = {}
+
+        # Holds a (count, word) entry per counter. Entries may lag behind the counters as they are incremented, and are
+        # only brought up to date when searching for the smallest counter.
+        self.heap = []
+
+    def add(self, words):
+        """
+        Counts each word within the list of words.
+        """
+
+        for word in words:
+            counter = self.counters.get(word)
+
+            if counter:
+                counter[0] += 1
+            elif len(self.counters) < self.capacity:
+                self.counters[word] = [1, 0]
+                heapq.heappush(self.heap, (1, word))
+            else:
+                # Replaces the smallest counter, inheriting its count as the error.
+                count = self.evict()
+                self.counters[word] = [count + 1, count]
+                heapq.heappush(self.heap, (count + 1, word))
+
+    def evict(self):
+        """
+        Removes the smallest counter and returns its count.
+        """
+
+        while True:
+            count, word = self.heap[0]
+            current_count = self.counters[word][0]
+
+            # Counts only ever increase, so an up-to-date entry at the top of the heap is the smallest counter.
+            if count == current_count:
+                heapq.heappop(self.heap)
+                del self.counters[word]
+
+                return count
+
+            heapq.heapreplace(self.heap, (current_count, word))
+
+    def merge(self, other):
+        """
+        Merges another summary into this summary. A word absent from a full
+        summary may have occurred up to that summary's smallest count, which is
+        therefore added to both the count and the error.
+        """
+
+        minimum = self.minimum()
+        other_minimum = other.minimum()
+        counters = {}
+
+        for word in set(self.counters) | set(other.counters):
+            count, error = self.counters.get(word, (minimum, minimum))
+            other_count, other_error = other.counters.get(word, (other_minimum, other_minimum))
+            counters[word] = [count + other_count, error + other_error]
+
+        # Retains the largest counters only.
+        self.counters = dict(heapq.nlargest(self.capacity, counters.iteritems(), key=lambda item: item[1][0]))
+        self.heap = [(counter[0], word) for word, counter in self.counters.iteritems()]
+        heapq.heapify(self.heap)
+
+    def minimum(self):
+        """
+        Returns the smallest count, or zero if there are unused counters.
+        """
+
+        if len(self.counters) < self.capacity:
+            return 0
+
+        return min(counter[0] for counter in self.counters.itervalues())
+
+
+def count_files(file_paths, jobs=None, capacity=None):
+    """
+    Generates and returns a dictionary of words and associated counts for the
+    files, or a summary of the most frequent words if the capacity (i.e. number
+    of counters) is specified. Optionally distributes shards of the files across
+    a pool of processes, and merges the partial counts (or summaries) as they
+    are completed.
+    """
+
+    if capacity:
+        words = HeavyHitters(capacity)
+    else:
+        words = {}
 
+    if jobs is None:
+        for file_path in file_paths:
+            shard = (file_path, 0, None)
 
-def get_count(file_content):
+            if capacity:
+                summarize_shard(shard, capacity, words)
+            else:
+                count_shard(shard, words)
+    else:
+        pool = multiprocessing.Pool(jobs)
+
+        try:
+            # Creates several shards per process to balance the load when shards finish unevenly.
+            shards = get_shards(file_paths, jobs * 4)
+
+            if capacity:
+                for summary in pool.imap_unordered(functools.partial(summarize_shard, capacity=capacity), shards):
+                    words.merge(summary)
+            else:
+                for partial_words in pool.imap_unordered(count_shard, shards):
+                    merge_count(words, partial_words)
+        finally:
+            pool.terminate()
+
+    return words
+
+
+def count_shard(shard, words=None):
+    """
+    Generates and returns a dictionary of words and associated counts for the
+    shard (being a tuple containing the file path, and the start and end
+    offsets). Both offsets must fall on a white-space boundary. Optionally
+    accumulates into an existing dictionary.
+    """
+
+    if words is None:
+        words = {}
+
+    for chunk in read_shard(shard):
+        get_count(chunk, words)
+
+    return words
+
+
+def find_boundary(file, offset):
+    """
+    Returns the offset of the first white-space character at (or following) the
+    specified offset, or the file size if there isn't one.
+    """
+
+    file.seek(offset)
+
+    while True:
+        chunk = file.read(4096)
+
+        if not chunk:
+            return offset
+
+        for index, character in enumerate(chunk):
+            if character in string.whitespace:
+                return offset + index
+
+        offset += len(chunk)
+
+
+def get_count(file_content, words=None):
     """
     Generates and returns a dictionary of words and associated counts based on
-    the file content.
+    the file content. Optionally accumulates into an existing dictionary, which
+    allows for the content to be counted in successive chunks.
     """
 
-    words = {}
+    return tokenizer.count_words(file_content, words)
+
+
+def get_shards(file_paths, shard_count):
+    """
+    Generates and returns a list of shards (with each shard being a tuple
+    containing the file path, and the start and end offsets) which divide the
+    files into roughly equal byte ranges. Large files are split on white-space
+    boundaries, so that no word spans two shards. Files which aren't regular
+    files (e.g. standard input or pipes) form a single shard.
+    """
+
+    file_sizes = [os.path.getsize(file_path) if os.path.isfile(file_path) else 0 for file_path in file_paths]
+    shard_size = max(sum(file_sizes) // shard_count, 1)
+    shards = []
+
+    for file_path, file_size in zip(file_paths, file_sizes):
+        if not os.path.isfile(file_path):
+            shards.append((file_path, 0, None))
+            continue
 
-    # Converts all of the words to lowercase, strips punctuation, and then determines the occurances.
-    for word in [word.lower().strip(".,:;-`'\"!?()[]") for word in file_content.split()]:
-        # Adds and initialises the word if it's absent within the words dictionary.
-        if word not in words:
-            words[word] = 0
+        start = 0
 
-        words[word] += 1
+        file = None
+
+        try:
+            file = open(file_path, "r")
+
+            while file_size - start > shard_size:
+                end = find_boundary(file, start + shard_size)
+                shards.append((file_path, start, end))
+                start = end
+        finally:
+            if file:
+                file.close()
+
+        if start < file_size:
+            shards.append((file_path, start, file_size))
+
+    return shards
+
+
+def index_count(index_path, file_paths, jobs=None, rebuild=False):
+    """
+    Generates and returns a dictionary of words and associated counts for the
+    files by using the index (being a SQLite database of the counts per file).
+    Only the files which are absent from the index, or whose size or
+    modification time have changed, are counted (and then indexed). Optionally
+    discards the entire index beforehand.
+    """
+
+    connection = sqlite3.connect(index_path)
+
+    try:
+        # Stores the words as (potentially non UTF-8) byte strings.
+        connection.text_factory = str
+
+        with connection:
+            if rebuild:
+                connection.execute("DROP TABLE IF EXISTS files")
+                connection.execute("DROP TABLE IF EXISTS counts")
+
+            connection.execute("CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime REAL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS counts (file_id INTEGER, word TEXT, count INTEGER, PRIMARY KEY (file_id, word))")
+
+        file_ids = []
+
+        for file_path in file_paths:
+            file_path = os.path.abspath(file_path)
+            file_stat = os.stat(file_path)
+
+            row = connection.execute("SELECT id, size, mtime FROM files WHERE path = ?", (file_path,)).fetchone()
+
+            if row and row[1:] == (file_stat.st_size, file_stat.st_mtime):
+                file_ids.append(row[0])
+                continue
+
+            words = count_files([file_path], jobs)
+
+            # Replaces the counts (if any) for the file, committing each file so that progress isn't lost.
+            with connection:
+                if row:
+                    connection.execute("DELETE FROM counts WHERE file_id = ?", (row[0],))
+                    connection.execute("DELETE FROM files WHERE id = ?", (row[0],))
+
+                file_id = connection.execute("INSERT INTO files (path, size, mtime) VALUES (?, ?, ?)", (file_path, file_stat.st_size, file_stat.st_mtime)).lastrowid
+                connection.executemany("INSERT INTO counts VALUES (?, ?, ?)", ((file_id, word, count) for word, count in words.iteritems()))
+
+            file_ids.append(file_id)
+
+        # Sums the counts across the selected files (which may be a subset of the indexed files).
+        connection.execute("CREATE TEMP TABLE selected_files (id INTEGER PRIMARY KEY)")
+        connection.executemany("INSERT OR IGNORE INTO selected_files VALUES (?)", ((file_id,) for file_id in file_ids))
+
+        return dict(connection.execute("SELECT word, SUM(count) FROM counts WHERE file_id IN (SELECT id FROM selected_files) GROUP BY word"))
+    finally:
+        connection.close()
+
+
+def merge_count(words, partial_words):
+    """
+    Merges a dictionary of words and associated counts into another (which is
+    then returned).
+    """
+
+    for word, count in partial_words.iteritems():
+        words[word] = words.get(word, 0) + count
 
     return words
 
 
-def print_all(file_content):
+def print_all(words):
     """
     Outputs (prints) all of the words and associated counts in ascending
     alphabetical order.
     """
 
-    words = get_count(file_content)
-
     # Sorts the keys alphabetically ascending.
     for word in sorted(words):
         print word + " " + str(words[word])
@@ -48,26 +325,65 @@ def print_all(file_content):
     print "\nDisplaying all of the " + str(len(words)) + " words."
 
 
-def print_top(file_content):
+def print_approximate_top(summary, limit=TOP_LIMIT):
+    """
+    Outputs (prints) a limited selection of the approximated words and
+    associated counts (with the maximum error of each count) in descending
+    numerical order.
+    """
+
+    # Selects the largest counters, resolving ties alphabetically ascending.
+    top = heapq.nsmallest(limit, summary.counters.iteritems(), key=lambda item: (-item[1][0], item[0]))
+
+    for word, (count, error) in top:
+        print word + " " + str(count) + " (error <= " + str(error) + ")"
+
+    print "\nDisplaying the approximate top " + str(len(top)) + " words only, using " + str(summary.capacity) + " counters."
+
+
+def print_top(words, limit=TOP_LIMIT):
     """
     Outputs (prints) a limited selection of words and associated counts in
     descending numerical order.
     """
 
-    words = get_count(file_content)
-    limit = 20
-    count = 0
+    # Selects the keys with the largest values (without sorting the entire dictionary), resolving ties alphabetically
+    # ascending.
+    top = heapq.nsmallest(limit, words.iteritems(), key=lambda item: (-item[1], item[0]))
 
-    # Sorts the keys by the corresponding value numerically descending.
-    for word in sorted(words, key=lambda word: words[word], reverse=True):
-        print word + " " + str(words[word])
+    for word, count in top:
+        print word + " " + str(count)
 
-        count += 1
+    print "\nDisplaying the top " + str(len(top)) + " words only."
 
-        if count == limit:
-            break
 
-    print "\nDisplaying the top " + str(count) + " words only."
+def read_shard(shard):
+    """
+    Yields the chunks of the file specified by the shard (being a tuple
+    containing the file path, and the start and end offsets, with the end
+    offset being None for the remainder of the file).
+    """
+
+    file_path, start, end = shard
+
+    for chunk in reader.iter_chunks(file_path, start, end):
+        yield chunk
+
+
+def summarize_shard(shard, capacity, summary=None):
+    """
+    Generates and returns a summary of the most frequent words for the shard
+    (being a tuple containing the file path, and the start and end offsets).
+    Optionally accumulates into an existing summary.
+    """
+
+    if summary is None:
+        summary = HeavyHitters(capacity)
+
+    for chunk in read_shard(shard):
+        summary.add(tokenizer.tokenize(chunk))
+
+    return summary
 
 
 def main():
@@ -75,44 +391,128 @@ def main():
     Does the magic.
     """
 
+    # Removes the file name of this script from the arguments list.
+    del sys.argv[0]
+
+    # Ensures the jobs argument, if specified, is well-formed and valid.
+    jobs = None
+
+    if "--jobs" in sys.argv:
+        try:
+            assert sys.argv[0] == "--jobs"
+            jobs = int(sys.argv[1])
+            assert jobs > 0
+            del sys.argv[:2]
+        except:
+            print "Error. The jobs argument is malformed."
+            sys.exit(1)
+
+    # Ensures the approx argument, if specified, is well-formed and valid.
+    capacity = None
+
+    if "--approx" in sys.argv:
+        try:
+            assert sys.argv[0] == "--approx"
+            capacity = int(sys.argv[1])
+            assert capacity > 0
+            del sys.argv[:2]
+        except:
+            print "Error. The approx argument is malformed."
+            sys.exit(1)
+
+    # Ensures the index argument, if specified, is well-formed and valid.
+    index_path = None
+
+    if "--index" in sys.argv:
+        try:
+            assert sys.argv[0] == "--index"
+            index_path = os.path.abspath(sys.argv[1])
+            del sys.argv[:2]
+        except:
+            print "Error. The index argument is malformed."
+            sys.exit(1)
+
+        if capacity:
+            print "Error. The approx argument can't be combined with the index argument."
+            sys.exit(1)
+
+    # Ensures the rebuild argument, if specified, is well-formed and valid.
+    rebuild = False
+
+    if "--rebuild" in sys.argv:
+        try:
+            assert sys.argv[0] == "--rebuild"
+            assert index_path
+            rebuild = True
+            del sys.argv[0]
+        except:
+            print "Error. The rebuild argument is malformed."
+            sys.exit(1)
+
     # Ensures the argument count is valid.
-    if len(sys.argv) != 3:
+    if len(sys.argv) < 2:
         print "Error. Invalid argument count."
         sys.exit(1)
 
-    option = sys.argv[1]
+    option = sys.argv[0]
 
     # Ensures the option argument is valid.
     if option not in ["--all", "--top"]:
         print "Error. Invalid option."
         sys.exit(1)
 
-    file_path = sys.argv[2]
-
-    # Ensures the file path argument is valid.
-    if not os.path.exists(file_path):
-        print "Error. Invalid file path."
+    if option == "--all" and capacity:
+        print "Error. The approx argument is only valid with the top option."
         sys.exit(1)
 
-    # Opens, reads, and closes the file.
-    file = None
+    del sys.argv[0]
+
+    # Ensures the limit, if specified following the top option, is valid.
+    limit = TOP_LIMIT
 
+    if option == "--top" and len(sys.argv) > 1 and sys.argv[0].isdigit():
+        limit = int(sys.argv[0])
+        del sys.argv[0]
+
+    file_paths = sys.argv
+
+    # Ensures the specified file path is (or paths are) valid, with '-' denoting standard input.
+    for file_path in file_paths:
+        if file_path != "-" and not os.path.exists(file_path):
+            print "Error. Invalid file path (or paths)."
+            sys.exit(1)
+
+        # Standard input is unavailable to the pool of processes.
+        if file_path == "-" and jobs:
+            print "Error. Standard input can't be combined with the jobs argument."
+            sys.exit(1)
+
+        if index_path and not os.path.isfile(file_path):
+            print "Error. Only regular files can be indexed."
+            sys.exit(1)
+
+    # Counts (or approximates) the words within each file, or serves the counts from the index (which only counts
+    # the files that are absent or have changed since being indexed).
     try:
-        file = open(file_path, "r")
-        file_content = file.read()
+        if index_path:
+            words = index_count(index_path, file_paths, jobs, rebuild)
+        else:
+            words = count_files(file_paths, jobs, capacity)
+    except sqlite3.Error:
+        print "Error. Unable to read (or update) the index."
+        sys.exit(1)
     except:
-        print "Error. Unable to read the file."
+        print "Error. Unable to read the file (or files)."
         sys.exit(1)
-    finally:
-        if file:
-            file.close()
 
     # Selects the processing operation based on the option argument.
     if option == "--all":
-        print_all(file_content)
+        print_all(words)
+    elif capacity:
+        print_approximate_top(words, limit)
     else:
-        print_top(file_content)
+        print_top(words, limit)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -3,131 +3,587 @@ Completed solution for the 'mimic' exercise featured within Google's Python
 course.
 
 This script reads the contents of the specified file, generates a dictionary of
-words (which are mapped to a list of proceding words), and then simulates the
-language used in the specified file by using the dictionary of words and random
-selections.
+words (which are mapped to the proceding words and associated counts), and then
+simulates the language used in the specified file by using the dictionary of
+words and weighted random selections.
+
+Optionally, the dictionary can also map sequences of words (up to the specified
+order) rather than single words, which can be pruned to bound the memory usage.
+A sequence lacking proceding words backs off to shorter sequences.
+
+Optionally, the dictionary of words can instead be saved to a compact binary
+model file, which can then be loaded (i.e. memory-mapped) by subsequent runs
+without reparsing the file.
+
+Optionally, the number of words (per section), the number of sections, and the
+seed for the random selections (for reproducible output) can be specified.
 
 Usage:
-    python 06_mimic.py <file_path>
+    python 06_mimic.py [--words <words>] [--count <count>] [--seed <seed>] [--order <order>] [--min-count <min_count>] [--max-states <max_states>] [--save-model <model_path>] <file_path>
+    python 06_mimic.py --load-model <model_path> [--words <words>] [--count <count>] [--seed <seed>]
+
+The file path '-' denotes standard input.
 """
 
 
+import array
+import bisect
+import collections
+import heapq
+import itertools
+import mmap
 import os
 import random
+import reader
+import struct
 import sys
+import tokenizer
+
+
+# A compact dictionary of words, with each word interned to an integer ID (being the index within the vocabulary). The
+# ID 0 is reserved for the seed (i.e. the empty word). The dictionary contains a table per order, with the table of
+# order N mapping each state (i.e. sequence of N word IDs) to the proceding words.
+CompactDict = collections.namedtuple("CompactDict", ["vocabulary", "tables"])
+
+# The states of a table are stored in ascending order within the contexts array (with each state occupying N
+# consecutive word IDs), except for the first order table in which each state is simply a word ID. The proceding words
+# of each state are stored as IDs within the followers array between the offsets of the state and the next state,
+# alongside the cumulative counts which allow for weighted random selections.
+Table = collections.namedtuple("Table", ["contexts", "offsets", "followers", "cumulative_counts"])
+
+# The saved dictionary format, which begins with a header containing the magic number, the vocabulary size, and the
+# order. Each table follows, beginning with a header containing the state count and follower count followed by the
+# contexts (unless it's the first order table), offsets, followers, and cumulative counts arrays. The vocabulary (being
+# an array of offsets followed by the concatenated words) is last. All integers are little-endian 32 bit unsigned
+# integers.
+MODEL_MAGIC = "MIMIC002"
+MODEL_HEADER = struct.Struct("<8sII")
+MODEL_TABLE_HEADER = struct.Struct("<II")
+MODEL_INTEGER = struct.Struct("<I")
+
+# The mask of a word ID within a packed sequence of word IDs.
+ID_MASK = 0xFFFFFFFF
 
+SECTION_LENGTH = 200  # Unit in words.
+PARAGRAPH_LENGTH = 3  # Unit in sentences.
+SENTENCE_LENGTH = 15  # Unit in words.
+WRITE_BUFFER_SIZE = 64 * 1024  # Unit in characters.
 
-def generate_dict(file_content):
+
+class MappedArray(object):
+    """
+    Provides read-only access to an array of integers stored within a
+    memory-mapped file, without copying the array into memory.
     """
-    Generates and returns a dictionary of words mapped to a list of proceding
-    words.
+
+    def __init__(self, mapping, offset, length):
+        self.mapping = mapping
+        self.offset = offset
+        self.length = length
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.length:
+            raise IndexError
+
+        return MODEL_INTEGER.unpack_from(self.mapping, self.offset + index * MODEL_INTEGER.size)[0]
+
+    def __len__(self):
+        return self.length
+
+
+class MappedVocabulary(object):
     """
+    Provides read-only access to the vocabulary stored within a memory-mapped
+    file, with each word only being copied into memory when accessed.
+    """
+
+    def __init__(self, mapping, offsets, offset):
+        self.mapping = mapping
+        self.offsets = offsets
+        self.offset = offset
+
+    def __getitem__(self, id):
+        return self.mapping[self.offset + self.offsets[id]:self.offset + self.offsets[id + 1]]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def index(self, word):
+        for id in xrange(len(self)):
+            if self[id] == word:
+                return id
+
+        raise ValueError
+
+
+def build_table(counts, order, min_count=1, max_states=None):
+    """
+    Generates and returns a table based on the counts of each state (i.e.
+    packed sequence of word IDs) and proceding word ID, which are packed into a
+    single integer. Optionally discards the proceding words below the minimum
+    count, and retains the most frequent states only.
+    """
+
+    if min_count > 1:
+        counts = dict((pair, count) for pair, count in counts.iteritems() if count >= min_count)
+
+    if max_states is not None:
+        counts = prune_states(counts, max_states)
+
+    contexts = array.array("I")
+    offsets = array.array("I", [0])
+    followers = array.array("I")
+    cumulative_counts = array.array("I")
+    previous_state = None
+    total = 0
+
+    # Stores the pairs (which are sorted by the state) as contiguous arrays.
+    for pair, count in sorted(counts.iteritems()):
+        state = pair >> 32
+
+        # Starts a range of proceding words (and resets the cumulative count) for each state.
+        if state != previous_state:
+            if previous_state is not None:
+                offsets.append(len(followers))
+
+            contexts.extend((state >> (32 * i)) & ID_MASK for i in reversed(range(order)))
+            total = 0
 
-    # Converts all of the words to lowercase and strips the punctuation.
-    words = [word.lower().strip(".,:;-`'\"!?()[]") for word in file_content.split()]
+        total += count
+        followers.append(pair & ID_MASK)
+        cumulative_counts.append(total)
+        previous_state = state
 
-    dict = {}
+    if followers:
+        offsets.append(len(followers))
 
-    # Maps each word to the trailing word (or words).
-    for i in range(len(words)):
-        # Provides a seed for a word that lacks a trailing word.
-        # Typically, this occurs when the last word within a file is unique.
-        if i == 0:
-            dict[""] = [words[i]]
+    # The states of the first order table are implied, as every word ID has proceding words.
+    if order == 1:
+        contexts = None
 
-        # Adds and initialises the word if it's absent within the words dictionary.
-        if words[i] not in dict:
-            dict[words[i]] = []
+    return Table(contexts, offsets, followers, cumulative_counts)
 
-        # Maps the last word, if unique, to the seed created earlier.
-        if i == len(words) - 1:
-            # The word being mapped to an empty list indicates it is unique.
-            if not dict[words[i]]:
-                dict[words[i]].append("")
+
+def choose_follower(dict, history):
+    """
+    Returns the ID of a proceding word randomly selected from the dictionary
+    for the longest state (i.e. sequence of word IDs) at the end of the history
+    that has proceding words, which is weighted by the associated counts.
+    """
+
+    for order in range(min(len(dict.tables), len(history)), 0, -1):
+        table = dict.tables[order - 1]
+
+        if table.contexts is None:
+            state = history[-1]
         else:
-            dict[words[i]].append(words[i + 1])
+            state = find_state(table, tuple(history[-order:]))
+
+        # Backs off to the next order.
+        if state is None:
+            continue
+
+        start = table.offsets[state]
+        end = table.offsets[state + 1]
+
+        # Selects a random position within the state's cumulative counts.
+        position = int(random.random() * table.cumulative_counts[end - 1])
 
-    return dict
+        return table.followers[bisect.bisect_right(table.cumulative_counts, position, start, end)]
 
+    raise ValueError
 
-def print_dict(dict, seed):
+
+def find_state(table, context):
     """
-    Generates output based on the dictionary of words and initial seed.
+    Returns the index of the state (i.e. tuple of word IDs) within the table, or
+    None if it lacks proceding words.
     """
 
-    output = ""
+    if table.contexts is None:
+        return context[0]
+
+    order = len(context)
+    state_count = len(table.offsets) - 1
+    low = 0
+    high = state_count
 
-    if dict:
-        section_length = 200  # Unit in words.
-        paragraph_length = 3  # Unit in sentences.
-        sentence_length = 15  # Unit in words.
-        count = 0
+    # Performs a binary search of the states.
+    while low < high:
+        middle = (low + high) // 2
+
+        if tuple(table.contexts[middle * order + i] for i in range(order)) < context:
+            low = middle + 1
+        else:
+            high = middle
 
-        while count < section_length:
-            # Selects a random word from the seed's mapped list.
-            word = random.choice(dict[seed])
+    if low < state_count and tuple(table.contexts[low * order + i] for i in range(order)) == context:
+        return low
 
-            # Processes and appends the word to the output.
-            # Skips the word if it is of zero length.
-            if word != "":
-                count += 1
+    return None
 
-                # Determines if the word is at the start of a sentence.
-                # Adds appropriate formatting.
-                if count % sentence_length == 1:
-                    output += word.capitalize()
-                else:
-                    output += word
 
-                # Determines if the word is at the end of a sentence, paragraph, or section.
-                # Adds appropriate punctuation.
-                if count % sentence_length == 0 or count == section_length:
-                    if count % (sentence_length * paragraph_length) == 0:
-                        output += ".\n\n"
-                    else:
-                        output += ". "
-                else:
-                    output += " "
+def generate_sentences(dict, seed, word_count):
+    """
+    Yields the formatted sentences (including the trailing punctuation) of a
+    section containing the specified number of words, which are generated
+    based on the dictionary of words and initial seed.
+    """
 
-            # Updates the seed to continue the chain.
-            seed = word
+    words = generate_words(dict, seed)
+    count = 0
 
-    print output
+    while count < word_count:
+        sentence = list(itertools.islice(words, min(SENTENCE_LENGTH, word_count - count)))
+        count += len(sentence)
 
+        # Capitalises the word at the start of the sentence.
+        sentence[0] = sentence[0].capitalize()
 
-def main():
+        # Determines if the sentence is at the end of a paragraph.
+        # Adds appropriate punctuation.
+        if count % (SENTENCE_LENGTH * PARAGRAPH_LENGTH) == 0:
+            yield " ".join(sentence) + ".\n\n"
+        else:
+            yield " ".join(sentence) + ". "
+
+
+def generate_words(dict, seed):
     """
-    Does the magic.
+    Yields an endless sequence of words randomly selected from the dictionary
+    of words, beginning with the proceding words of the initial seed. Skips the
+    words which are of zero length.
+    """
+
+    history = [dict.vocabulary.index(seed)]
+    order = len(dict.tables)
+
+    while True:
+        id = choose_follower(dict, history)
+
+        # Updates the history to continue the chain.
+        history.append(id)
+        del history[:-order]
+
+        if id:
+            yield dict.vocabulary[id]
+
+
+def generate_dict(chunks, order=1, min_count=1, max_states=None):
     """
+    Generates and returns a compact dictionary of words mapped to the proceding
+    words and associated counts, based on the chunks of file content (which
+    must each end on a white-space boundary). The dictionary contains a table
+    for each order up to the specified order, with each table (other than the
+    first) optionally being limited to the proceding words of the minimum count
+    and the most frequent states.
+    """
+
+    ids = {"": 0}
+    vocabulary = [""]
+
+    # Counts each state and proceding word ID per order, which are packed into a single integer (with the most recent
+    # word occupying the least significant 32 bits) to avoid storing a tuple per pair. Tracks the total count of each
+    # state per order, if the states are limited, which allows for pruning whilst streaming.
+    counts = [{} for _ in range(order)]
+    totals = [{} for _ in range(order)]
+
+    # Holds the states (i.e. packed sequences of word IDs) of each order which end with the previous word.
+    states = []
+
+    for chunk in chunks:
+        # Converts all of the words to lowercase and strips the punctuation.
+        for word in tokenizer.tokenize(chunk):
+            # Interns the word if it's absent within the vocabulary.
+            id = ids.get(word)
+
+            if id is None:
+                id = ids[word] = len(vocabulary)
+                vocabulary.append(word)
 
-    # Ensures the argument count is valid.
-    if len(sys.argv) != 2:
-        print "Error. Invalid argument count."
-        sys.exit(1)
+            # Provides a seed (i.e. maps the empty word) for the initial word.
+            if not states:
+                counts[0][id] = 1
 
-    file_path = sys.argv[1]
+            for i, state in enumerate(states):
+                pair = state << 32 | id
+                counts[i][pair] = counts[i].get(pair, 0) + 1
 
-    # Ensures the file path argument is valid.
-    if not os.path.exists(file_path):
-        print "Error. Invalid file path."
-        sys.exit(1)
+                # Prunes the least frequent states once there are twice as many as the limit.
+                if i and max_states is not None:
+                    totals[i][state] = totals[i].get(state, 0) + 1
+
+                    if len(totals[i]) > max_states * 2:
+                        counts[i] = prune_states(counts[i], max_states, totals[i])
+                        totals[i] = dict((state, totals[i][state]) for state in set(pair >> 32 for pair in counts[i]))
+
+            states = [id] + [state << 32 | id for state in states[:order - 1]]
+
+    # Maps the last word, if unique, to the seed. This occurs when the last word lacks a proceding word.
+    if states and not any(pair >> 32 == states[0] for pair in counts[0]):
+        counts[0][states[0] << 32] = 1
+
+    # Limits each table other than the first, which is retained in full so that every word has proceding words.
+    tables = [build_table(counts[0], 1)]
+
+    for i in range(1, order):
+        tables.append(build_table(counts[i], i + 1, min_count, max_states))
+
+    return CompactDict(vocabulary, tables)
+
+
+def load_dict(model_path):
+    """
+    Loads and returns the compact dictionary of words saved to the desired
+    path, which is memory-mapped (and thus only read as it's accessed).
+    """
+
+    file = None
+
+    # Opens, maps, and closes the file. The mapping remains valid after the file is closed.
+    try:
+        file = open(model_path, "rb")
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        if file:
+            file.close()
+
+    try:
+        magic, vocabulary_size, order = MODEL_HEADER.unpack_from(mapping)
+
+        if magic != MODEL_MAGIC or not order:
+            raise ValueError
+
+        offset = MODEL_HEADER.size
+        tables = []
+
+        # Locates each of the arrays within each table.
+        for table_order in range(1, order + 1):
+            state_count, follower_count = MODEL_TABLE_HEADER.unpack_from(mapping, offset)
+            offset += MODEL_TABLE_HEADER.size
+            arrays = []
+
+            for length in [state_count * table_order if table_order > 1 else 0, state_count + 1, follower_count, follower_count]:
+                arrays.append(MappedArray(mapping, offset, length))
+                offset += length * MODEL_INTEGER.size
+
+            if table_order == 1:
+                arrays[0] = None
+
+            tables.append(Table(*arrays))
+
+        word_offsets = MappedArray(mapping, offset, vocabulary_size + 1)
+        offset += (vocabulary_size + 1) * MODEL_INTEGER.size
+
+        if offset + word_offsets[vocabulary_size] != len(mapping):
+            raise ValueError
+    except (IndexError, struct.error):
+        raise ValueError
+
+    return CompactDict(MappedVocabulary(mapping, word_offsets, offset), tables)
+
+
+def print_dict(dict, seed, word_count=SECTION_LENGTH, stream=None):
+    """
+    Generates output based on the dictionary of words and initial seed, and
+    writes it to the stream (which defaults to standard output).
+    """
+
+    if stream is None:
+        stream = sys.stdout
+
+    if dict.tables[0].followers:
+        write_text(stream, generate_sentences(dict, seed, word_count))
+
+    stream.write("\n")
+
+
+def prune_states(counts, max_states, totals=None):
+    """
+    Generates and returns the counts of each state and proceding word ID (which
+    are packed into a single integer) limited to the most frequent states,
+    based on the total count of each state (which is calculated if absent).
+    """
+
+    if totals is None:
+        totals = {}
+
+        for pair, count in counts.iteritems():
+            totals[pair >> 32] = totals.get(pair >> 32, 0) + count
+
+    if len(totals) <= max_states:
+        return counts
+
+    # Resolves ties by the states themselves, so that the pruning is deterministic.
+    states = set(heapq.nlargest(max_states, totals, key=lambda state: (totals[state], state)))
+
+    return dict((pair, count) for pair, count in counts.iteritems() if pair >> 32 in states)
+
+
+def save_dict(dict, model_path):
+    """
+    Saves the compact dictionary of words to the desired path (presumably, on
+    non-volatile storage).
+    """
+
+    # Generates the offsets of each word within the concatenated words.
+    word_offsets = array.array("I", [0])
+
+    for word in dict.vocabulary:
+        word_offsets.append(word_offsets[-1] + len(word))
 
     file = None
 
-    # Opens, reads, and closes the file.
+    # Opens, writes to, and closes the file.
     try:
-        file = open(file_path, "r")
-        file_content = file.read()
-    except:
-        print "Error. Unable to read the file."
-        sys.exit(1)
+        file = open(model_path, "wb")
+        file.write(MODEL_HEADER.pack(MODEL_MAGIC, len(dict.vocabulary), len(dict.tables)))
+
+        for table in dict.tables + [None]:
+            if table:
+                file.write(MODEL_TABLE_HEADER.pack(len(table.offsets) - 1, len(table.followers)))
+                arrays = [table.contexts or array.array("I"), table.offsets, table.followers, table.cumulative_counts]
+            else:
+                arrays = [word_offsets]
+
+            for integers in arrays:
+                # Converts the native byte order to little-endian, if required.
+                if sys.byteorder == "big":
+                    integers = array.array("I", integers)
+                    integers.byteswap()
+
+                integers.tofile(file)
+
+        for word in dict.vocabulary:
+            file.write(word)
     finally:
         if file:
             file.close()
 
-    # Generates the output.
-    print_dict(generate_dict(file_content), "")
+
+def write_text(stream, pieces):
+    """
+    Writes the pieces of text to the stream, which are joined into buffers to
+    avoid both repeated concatenation and a write per piece.
+    """
+
+    buffer = []
+    buffer_size = 0
+
+    for piece in pieces:
+        buffer.append(piece)
+        buffer_size += len(piece)
+
+        if buffer_size >= WRITE_BUFFER_SIZE:
+            stream.write("".join(buffer))
+            buffer = []
+            buffer_size = 0
+
+    stream.write("".join(buffer))
+
+
+def main():
+    """
+    Does the magic.
+    """
+
+    # Removes the file name of this script from the arguments list.
+    del sys.argv[0]
+
+    # Ensures the load model argument, if specified, is well-formed and valid.
+    load_path = None
+
+    if "--load-model" in sys.argv:
+        try:
+            assert sys.argv[0] == "--load-model"
+            load_path = sys.argv[1]
+            del sys.argv[:2]
+        except:
+            print "Error. The load model argument is malformed."
+            sys.exit(1)
+
+        if not os.path.exists(load_path):
+            print "Error. Invalid model path."
+            sys.exit(1)
+
+    # Ensures the words, count, seed, order, min count, and max states arguments, if specified, are well-formed and
+    # valid.
+    options = {"--words": SECTION_LENGTH, "--count": 1, "--seed": None, "--order": 1, "--min-count": 1, "--max-states": None}
+
+    for option in ["--words", "--count", "--seed", "--order", "--min-count", "--max-states"]:
+        if option in sys.argv:
+            try:
+                assert sys.argv[0] == option
+                # The dictionary is generated prior to being saved, so the order, min count, and max states don't
+                # apply to a loaded model.
+                assert not load_path or option in ["--words", "--count", "--seed"]
+                options[option] = int(sys.argv[1])
+                assert options[option] > 0 or option == "--seed"
+                del sys.argv[:2]
+            except:
+                print "Error. The " + option[2:].replace("-", " ") + " argument is malformed."
+                sys.exit(1)
+
+    # Ensures the save model argument, if specified, is well-formed and valid.
+    save_path = None
+
+    if "--save-model" in sys.argv:
+        try:
+            assert sys.argv[0] == "--save-model"
+            assert not load_path
+            save_path = os.path.abspath(sys.argv[1])
+            del sys.argv[:2]
+        except:
+            print "Error. The save model argument is malformed."
+            sys.exit(1)
+
+    if load_path:
+        # Ensures the argument count is valid, as a file path mustn't be specified.
+        if sys.argv:
+            print "Error. Invalid argument count."
+            sys.exit(1)
+
+        # Loads the dictionary of words.
+        try:
+            dict = load_dict(load_path)
+        except (EnvironmentError, ValueError):
+            print "Error. Unable to load the model."
+            sys.exit(1)
+    else:
+        # Ensures the argument count is valid.
+        if len(sys.argv) != 1:
+            print "Error. Invalid argument count."
+            sys.exit(1)
+
+        file_path = sys.argv[0]
+
+        # Ensures the file path argument is valid, with '-' denoting standard input.
+        if file_path != "-" and not os.path.exists(file_path):
+            print "Error. Invalid file path."
+            sys.exit(1)
+
+        # Maps (or reads) the file in chunks, rather than copying the entire file into memory.
+        try:
+            dict = generate_dict(reader.iter_chunks(file_path), options["--order"], options["--min-count"], options["--max-states"])
+        except:
+            print "Error. Unable to read the file."
+            sys.exit(1)
+
+    # Saves the dictionary of words or generates the output.
+    if save_path:
+        try:
+            save_dict(dict, save_path)
+        except:
+            print "Error. Unable to create or write to the model file."
+            sys.exit(1)
+    else:
+        # Seeds the random selections, if requested, so that the output is reproducible.
+        if options["--seed"] is not None:
+            random.seed(options["--seed"])
+
+        for _ in range(options["--count"]):
+            print_dict(dict, "", options["--words"])
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
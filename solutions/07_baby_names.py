@@ -4,60 +4,639 @@ course.
 
 This script extracts a list of baby names and associated ranks for a particular
 year, based on a HTML document produced by the Social Security administration,
-and optionally generates a summary file.
+and optionally generates a summary file. The files can optionally be processed
+across a pool of processes. Summary files can optionally be built incrementally,
+in which case files which are unchanged since their summary was generated (based
+on a hash of their contents, and of the summary itself) are skipped. The results can optionally be output
+as CSV, JSON Lines, or Parquet (which requires the pyarrow package) rather than
+text, for bulk loading.
+
+Alternatively, the rankings can be ingested into a database across years, which
+can then be queried for the history of a name, the top ranked names for a year,
+or the names with the biggest changes in rank between two years.
+
+The benchmark mode generates synthetic year files, and measures the speedup of
+processing them across a pool of processes, the throughput of selecting the
+names (against comparing the ranks as strings), and the write and load times of
+each output format.
 
 Usage:
-    python 07_baby_names.py [--limit <limit>] [--save-summary] <html_path> [<html_path>]
+    python 07_baby_names.py [--jobs <jobs>] [--format <format>] [--limit <limit>] [--save-summary [--incremental]] <html_path> [<html_path>]
+    python 07_baby_names.py [--jobs <jobs>] --ingest <database_path> <html_path> [<html_path>]
+    python 07_baby_names.py --query <database_path> history <name>
+    python 07_baby_names.py --query <database_path> top <year> [<count>]
+    python 07_baby_names.py --query <database_path> movers <from_year> <to_year> [<count>]
+    python 07_baby_names.py --benchmark [<year_count>]
 """
 
 
+import cStringIO
+import csv
+import functools
+import hashlib
+import itertools
+import json
+import multiprocessing
 import os
+import random
 import re
+import shutil
+import sqlite3
+import string
 import sys
+import tempfile
+import time
+import timeit
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+BENCHMARK_NAMES = 1000  # Unit in ranks (per year).
+
+BENCHMARK_YEARS = 100
+
+CHUNK_SIZE = 64 * 1024  # Unit in bytes.
+
+FORMATS = ["text", "csv", "jsonl", "parquet"]
+
+# Bounds the unmatched content carried over between chunks, which is the maximum length of a match.
+CARRY_LIMIT = 64 * 1024  # Unit in bytes.
+
+QUERY_LIMIT = 20  # Unit in names (or ranks).
+
+# Matches either the year or a set of names and associated rank.
+# Allows for variations in white-space and letter-casing.
+RANKING_PATTERN = re.compile(r"popularity\s+in\s+(\d{4})|<td>(\d+)</td>\s*<td>([a-z]+)</td>\s*<td>([a-z]+)</td>", re.IGNORECASE)
+
+# Determines the permissions of summary files, which are otherwise created as temporary files (readable only by the
+# owner).
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+class RankingWriter(object):
+    """
+    Streams the results (with each result being the year, and a list of names
+    and associated ranks) to a file in the specified format. Except for text,
+    each name is written as a record containing the year, name, and rank.
+    """
+
+    def __init__(self, file, output_format):
+        self.file = file
+        self.output_format = output_format
+        self.writer = None
+
+    def close(self):
+        """
+        Completes the file (without closing it), which is required for Parquet.
+        """
+
+        if self.output_format == "parquet" and self.writer:
+            self.writer.close()
+
+    def write(self, year, names):
+        """
+        Writes the year, and the list of names and associated ranks.
+        """
+
+        if self.output_format == "text":
+            self.file.write(year + "\n")
+            self.file.writelines(name + " " + str(rank) + "\n" for name, rank in names)
+        elif self.output_format == "csv":
+            if not self.writer:
+                self.writer = csv.writer(self.file, lineterminator="\n")
+                self.writer.writerow(["year", "name", "rank"])
+
+            self.writer.writerows((year, name, rank) for name, rank in names)
+        elif self.output_format == "jsonl":
+            # Encodes the year once, rather than for each name.
+            prefix = '{"year": ' + str(int(year)) + ', "name": '
+            self.file.writelines(prefix + json.dumps(name) + ', "rank": ' + str(rank) + "}\n" for name, rank in names)
+        else:
+            table = pyarrow.Table.from_arrays([pyarrow.array([int(year)] * len(names), pyarrow.int32()),
+                                               pyarrow.array([name for name, _rank in names], pyarrow.string()),
+                                               pyarrow.array([rank for _name, rank in names], pyarrow.int32())],
+                                              ["year", "name", "rank"])
+
+            # Writes each year as a row group.
+            if not self.writer:
+                self.writer = pyarrow.parquet.ParquetWriter(self.file, table.schema)
+
+            self.writer.write_table(table)
+
+
+def collect_rankings(file_path):
+    """
+    Reads the file and collects the rankings (with each ranking being a tuple
+    containing the year, rank, male name, and female name). Returns a tuple
+    containing the error message (or None), and the list of rankings.
+    """
+
+    file = None
+
+    # Opens, reads (and extracts the rankings in chunks), and closes the file.
+    try:
+        file = open(file_path, "r")
+        rankings = [ranking for ranking in iter_rankings(read_chunks(file)) if ranking[1] is not None]
+    except:
+        return "Error. Unable to read the file.", None
+    finally:
+        if file:
+            file.close()
+
+    # Ensures the year and the names and associated ranks were successfully extracted.
+    if not rankings or any(ranking[0] is None for ranking in rankings):
+        return "Error. Invalid file contents. The HTML structure is malformed.", None
+
+    return None, rankings
+
+
+def connect_database(database_path):
+    """
+    Connects to (and initialises, if required) the database of rankings across
+    years, and returns the connection. The rankings are stored per name ID,
+    year, and sex, and are indexed for queries by name and by year.
+    """
+
+    connection = sqlite3.connect(database_path)
+
+    with connection:
+        connection.execute("CREATE TABLE IF NOT EXISTS names (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+        connection.execute("CREATE TABLE IF NOT EXISTS rankings (name_id INTEGER, year INTEGER, sex TEXT, rank INTEGER, PRIMARY KEY (name_id, year, sex)) WITHOUT ROWID")
+        connection.execute("CREATE INDEX IF NOT EXISTS rankings_by_year ON rankings (year, sex, rank)")
+
+    return connection
 
 
 def extract_names(file_content):
     """
     Extracts and returns a list (which is alphabetically sorted) containing the
-    year, baby names, and associated ranks.
+    year, baby names, and associated ranks. A name which occurs at several ranks
+    retains its best (i.e. numerically lowest) rank.
+
+    >>> extract_names('Popularity in 2000<td>9</td><td>Bob</td><td>Sam</td><td>10</td><td>Sam</td><td>Ann</td>')
+    ['2000', 'Ann 10', 'Bob 9', 'Sam 9']
     """
 
-    matches = []
+    return rank_names(iter_rankings([file_content]))
 
-    # Attempts to extract the year.
-    # Allows for variations in white-space and letter-casing.
-    year_match = re.search(r"popularity\s+in\s+(\d{4})", file_content, re.IGNORECASE)
 
-    # Ensures the year was successfully extracted (as indicated by the MatchObject instance).
-    if year_match:
-        matches.append(year_match.group(1))
-    else:
-        raise ValueError
+def generate_document(year, names=BENCHMARK_NAMES):
+    """
+    Generates and returns a synthetic HTML document for the year, which follows
+    the structure of the Social Security administration documents, with random
+    names (some of which are duplicated across ranks).
+    """
 
-    # Attempts to extract the names and associated ranks.
-    # Allows for variations in white-space and letter-casing.
-    rankings = re.findall(r"<td>(\d+)</td>\s*<td>([a-z]+)</td>\s*<td>([a-z]+)</td>", file_content, re.IGNORECASE)
+    def random_name():
+        return random.choice(string.ascii_uppercase) + "".join(random.choice(string.ascii_lowercase) for _ in range(random.randint(3, 8)))
 
-    # Ensures the names and associated ranks were successfully extracted (as indicated by the non-empty list).
-    if rankings:
-        names = {}
+    rows = []
+    previous_name = random_name()
 
-        # Unpacks the list of tuples into a dictionary.
-        # Accounts for duplicate names by assigning the lowest rank.
-        for ranking in rankings:
-            rank, male_name, female_name = ranking
+    for rank in range(1, names + 1):
+        # Occasionally repeats the previous name, so that duplicate names are resolved.
+        name = previous_name if random.random() < 0.05 else random_name()
+        previous_name = random_name()
+        rows.append('<tr align="right"><td>%d</td><td>%s</td><td>%s</td>' % (rank, name, previous_name))
 
-            for name in [male_name, female_name]:
-                if name not in names or rank < names[name]:
-                    names[name] = rank
+    return '<html>\n<h3 align="center">Popularity in %d</h3>\n<table>\n%s\n</table>\n</html>\n' % (year, "\n".join(rows))
 
-        # Sorts the names alphabetically in preparation for final output.
-        for name in sorted(names):
-            matches.append(name + " " + str(names[name]))
-    else:
+
+def hash_file(file_path):
+    """
+    Generates and returns the hash of the contents of the file.
+    """
+
+    file = None
+    digest = hashlib.sha1()
+
+    # Opens, reads (and hashes in chunks), and closes the file.
+    try:
+        file = open(file_path, "r")
+
+        for chunk in read_chunks(file):
+            digest.update(chunk)
+    finally:
+        if file:
+            file.close()
+
+    return digest.hexdigest()
+
+
+def ingest_rankings(connection, rankings):
+    """
+    Inserts the rankings (with each ranking being a tuple containing the year,
+    rank, male name, and female name) into the database, replacing any existing
+    rankings for the same years. Duplicate names are assigned the lowest rank.
+    """
+
+    names = dict(connection.execute("SELECT name, id FROM names"))
+    rows = {}
+
+    for year, rank, male_name, female_name in rankings:
+        year = int(year)
+        rank = int(rank)
+
+        for name, sex in [(male_name, "M"), (female_name, "F")]:
+            # Adds the name if it's absent from the database.
+            if name not in names:
+                names[name] = connection.execute("INSERT INTO names (name) VALUES (?)", (name,)).lastrowid
+
+            key = (names[name], year, sex)
+
+            if key not in rows or rank < rows[key]:
+                rows[key] = rank
+
+    for year in set(year for _name_id, year, _sex in rows):
+        connection.execute("DELETE FROM rankings WHERE year = ?", (year,))
+
+    connection.executemany("INSERT INTO rankings VALUES (?, ?, ?, ?)", (key + (rank,) for key, rank in rows.iteritems()))
+
+
+def iter_rankings(chunks):
+    """
+    Yields a tuple for each year and each set of names and associated rank
+    within the chunks of a HTML document (or concatenated documents), in a
+    single pass. Each tuple contains the year, rank, male name, and female
+    name, with the rank and names being None for the year itself.
+    """
+
+    year = None
+    carry = ""
+
+    for chunk in chunks:
+        # Appends the chunk to the unmatched content carried over from the previous chunk.
+        content = carry + chunk
+        end = 0
+
+        for match in RANKING_PATTERN.finditer(content):
+            end = match.end()
+
+            if match.group(1):
+                year = match.group(1)
+                yield year, None, None, None
+            else:
+                yield (year,) + match.groups()[1:]
+
+        # Carries over the unmatched content, which may contain the start of a match that continues within the next
+        # chunk. A match can't span a matched region, so the content up to the final match is discarded.
+        carry = content[max(end, len(content) - CARRY_LIMIT):]
+
+
+def query_history(connection, name):
+    """
+    Generates and returns a list containing the rank of the name (per sex) for
+    each year, in ascending order.
+    """
+
+    rows = connection.execute("SELECT year, sex, rank FROM rankings JOIN names ON names.id = rankings.name_id WHERE names.name = ? ORDER BY year, sex", (name,))
+
+    return ["%d %s %d" % row for row in rows]
+
+
+def query_movers(connection, from_year, to_year, count):
+    """
+    Generates and returns a list containing the names (per sex) ranked in both
+    years with the largest changes in rank, in descending order of the change.
+    """
+
+    rows = connection.execute("SELECT name, a.sex, a.rank, b.rank, a.rank - b.rank AS change FROM rankings AS a JOIN rankings AS b ON b.name_id = a.name_id AND b.year = ? AND b.sex = a.sex JOIN names ON names.id = a.name_id WHERE a.year = ? ORDER BY ABS(change) DESC, name LIMIT ?", (to_year, from_year, count))
+
+    return ["%s %s %d %d %+d" % row for row in rows]
+
+
+def query_top(connection, year, count):
+    """
+    Generates and returns a list containing the names (per sex) up to the
+    specified rank for the year, in ascending order of rank.
+    """
+
+    rows = connection.execute("SELECT rank, sex, name FROM rankings JOIN names ON names.id = rankings.name_id WHERE year = ? AND rank <= ? ORDER BY sex, rank, name", (year, count))
+
+    return ["%d %s %s" % row for row in rows]
+
+
+def rank_names(rankings):
+    """
+    Generates and returns a list (which is alphabetically sorted) containing the
+    year, baby names, and associated ranks, based on the rankings.
+    """
+
+    year, names = select_names(rankings)
+
+    return [year] + [name + " " + str(rank) for name, rank in names]
+
+
+def read_chunks(file):
+    """
+    Yields fixed-size chunks of the file.
+    """
+
+    return iter(functools.partial(file.read, CHUNK_SIZE), "")
+
+
+def process_file(task):
+    """
+    Processes the task (being a tuple containing the file path, the output
+    format, the limit, whether a summary is requested, and whether it's built
+    incrementally) by reading the file, extracting the results, and then writing
+    the results to a summary file. Returns a tuple containing the error message
+    (or None), and the results (or None if written to, or unchanged within, a
+    summary file).
+    """
+
+    file_path, output_format, limit, summary, incremental = task
+
+    in_path, in_file = os.path.split(os.path.abspath(os.path.join(os.getcwd(), file_path)))
+    summary_path = os.path.join(in_path, in_file + ".summary" + ("" if output_format == "text" else "." + output_format))
+    hash_path = summary_path + ".hash"
+
+    # Skips the file if it's unchanged since the summary was generated (with the same limit), and the summary itself is
+    # unchanged since (i.e. it wasn't since rewritten by another run, with a differing limit).
+    if incremental:
+        try:
+            file_hash = hash_file(file_path) + " " + str(limit)
+        except:
+            return "Error. Unable to read the file.", None
+
+        file = None
+
+        # Opens, reads, and closes the file.
+        try:
+            file = open(hash_path, "r")
+            unchanged = file.read() == file_hash + " " + hash_file(summary_path)
+        except:
+            unchanged = False
+        finally:
+            if file:
+                file.close()
+
+        if unchanged:
+            return None, None
+
+    file = None
+
+    # Opens, reads (and extracts the results in chunks), and closes the file.
+    try:
+        file = open(file_path, "r")
+        year, names = select_names(iter_rankings(read_chunks(file)))
+    except ValueError:
+        return "Error. Invalid file contents. The HTML structure is malformed.", None
+    except:
+        return "Error. Unable to read the file.", None
+    finally:
+        if file:
+            file.close()
+
+    # Generates the results and writes to a file or returns them for standard output.
+    results = year, names[:limit]
+
+    if not summary:
+        return None, results
+
+    # Writes the summary prior to the hash (which includes a hash of the summary), so that an interrupted or concurrent
+    # run leaves a stale (rather than a matching) hash. The hash is removed if the summary isn't built incrementally.
+    try:
+        buffer = cStringIO.StringIO()
+        writer = RankingWriter(buffer, output_format)
+        writer.write(*results)
+        writer.close()
+
+        write_file(summary_path, buffer.getvalue())
+
+        if incremental:
+            write_file(hash_path, file_hash + " " + hashlib.sha1(buffer.getvalue()).hexdigest())
+        elif os.path.exists(hash_path):
+            os.remove(hash_path)
+    except:
+        return "Error. Unable to create or write to the file.", None
+
+    return None, None
+
+
+def run_benchmark(year_count=BENCHMARK_YEARS):
+    """
+    Benchmarks processing the synthetic year files serially against across a
+    pool of processes, selecting the names against comparing the ranks as
+    strings, and writing and loading each output format. Returns a list of lines
+    describing the results.
+    """
+
+    random.seed(0)
+    directory_path = tempfile.mkdtemp()
+    lines = []
+
+    try:
+        file_paths = []
+
+        for year in range(1900, 1900 + year_count):
+            file_path = os.path.join(directory_path, "baby" + str(year) + ".html")
+            write_file(file_path, generate_document(year))
+            file_paths.append(file_path)
+
+        # Processes the files (writing a summary of each), serially and then across a pool of processes.
+        jobs = multiprocessing.cpu_count()
+        tasks = [(file_path, "text", None, True, False) for file_path in file_paths]
+
+        summary_paths = [file_path + ".summary" for file_path in file_paths]
+
+        start_time = time.time()
+        serial_outcomes = map(process_file, tasks)
+        serial_seconds = time.time() - start_time
+        serial_hashes = map(hash_file, summary_paths)
+
+        pool = multiprocessing.Pool(jobs)
+
+        try:
+            start_time = time.time()
+            parallel_outcomes = pool.map(process_file, tasks)
+            parallel_seconds = time.time() - start_time
+        finally:
+            pool.terminate()
+
+        # Ensures that every file was processed, and that the summaries are identical.
+        if any(error for error, _results in serial_outcomes + parallel_outcomes) or map(hash_file, summary_paths) != serial_hashes:
+            raise ValueError
+
+        lines.append("Processing %d files:" % year_count)
+        lines.append("  %-24s %8.3f seconds" % ("serial", serial_seconds))
+        lines.append("  %-24s %8.3f seconds (%.2fx speedup)" % ("%d jobs" % jobs, parallel_seconds, serial_seconds / parallel_seconds))
+
+        # Collects the rankings of every file.
+        rankings_list = []
+
+        for file_path in file_paths:
+            error, rankings = collect_rankings(file_path)
+
+            if error:
+                raise ValueError
+
+            rankings_list.append(rankings)
+
+        # Selects the names from the rankings of every file, comparing the ranks as integers or (as previously) strings.
+        ranking_count = sum(len(rankings) for rankings in rankings_list)
+
+        def select_names_as_strings(rankings):
+            year = None
+            names = {}
+
+            for ranking_year, rank, male_name, female_name in rankings:
+                if year is None:
+                    year = ranking_year
+
+                if rank is None:
+                    continue
+
+                for name in [male_name, female_name]:
+                    if name not in names or rank < names[name]:
+                        names[name] = rank
+
+            return year, sorted(names.iteritems())
+
+        lines.append("")
+        lines.append("Selecting the names from %d rankings:" % ranking_count)
+
+        for name, function in [("strings (previously)", select_names_as_strings), ("integers", select_names)]:
+            seconds = min(timeit.repeat(lambda: [function(rankings) for rankings in rankings_list], number=1, repeat=3))
+            lines.append("  %-24s %8d rankings/second" % (name, ranking_count / seconds))
+
+        # Writes the results of every file in each format, and then loads them as tuples containing the year, name, and
+        # rank.
+        results = [select_names(rankings) for rankings in rankings_list]
+        records = [(int(year), name, rank) for year, names in results for name, rank in names]
+
+        def load_text(file):
+            loaded_records = []
+            year = None
+
+            for line in file:
+                fields = line.split()
+
+                if len(fields) == 1:
+                    year = int(fields[0])
+                else:
+                    loaded_records.append((year, fields[0], int(fields[1])))
+
+            return loaded_records
+
+        def load_csv(file):
+            reader = csv.reader(file)
+            next(reader)
+
+            return [(int(year), name, int(rank)) for year, name, rank in reader]
+
+        def load_jsonl(file):
+            return [(record["year"], record["name"], record["rank"]) for record in itertools.imap(json.loads, file)]
+
+        def load_parquet(file):
+            columns = pyarrow.parquet.read_table(file).to_pydict()
+
+            return zip(columns["year"], columns["name"], columns["rank"])
+
+        lines.append("")
+        lines.append("Writing and loading %d records:" % len(records))
+
+        for output_format, load in [("text", load_text), ("csv", load_csv), ("jsonl", load_jsonl), ("parquet", load_parquet)]:
+            if output_format == "parquet" and not pyarrow:
+                lines.append("  %-24s (requires the pyarrow package)" % output_format)
+                continue
+
+            file_path = os.path.join(directory_path, "results." + output_format)
+
+            def write():
+                with open(file_path, "wb") as file:
+                    writer = RankingWriter(file, output_format)
+
+                    for year, names in results:
+                        writer.write(year, names)
+
+                    writer.close()
+
+            def read():
+                with open(file_path, "rb") as file:
+                    return load(file)
+
+            write_seconds = min(timeit.repeat(write, number=1, repeat=3))
+            read_seconds = min(timeit.repeat(read, number=1, repeat=3))
+
+            # Ensures that each format loads the records identically.
+            if [(int(year), str(name), int(rank)) for year, name, rank in read()] != records:
+                raise ValueError
+
+            lines.append("  %-24s %8.3f seconds (write) %8.3f seconds (load) %10d bytes" % (output_format, write_seconds, read_seconds, os.path.getsize(file_path)))
+    finally:
+        shutil.rmtree(directory_path)
+
+    return lines
+
+
+def select_names(rankings):
+    """
+    Generates and returns a tuple containing the year, and a list (which is
+    alphabetically sorted) containing the baby names and associated ranks, based
+    on the rankings. Only the highest rank of each name is retained whilst
+    consuming the rankings.
+    """
+
+    year = None
+    names = {}
+
+    # Accounts for duplicate names by assigning the lowest rank. The ranks are converted to integers, so that they're
+    # compared numerically (rather than lexicographically, where "10" precedes "9").
+    for ranking_year, rank, male_name, female_name in rankings:
+        # Retains the first year (in the event of concatenated documents).
+        if year is None:
+            year = ranking_year
+
+        if rank is None:
+            continue
+
+        rank = int(rank)
+
+        if male_name not in names or rank < names[male_name]:
+            names[male_name] = rank
+
+        if female_name not in names or rank < names[female_name]:
+            names[female_name] = rank
+
+    # Ensures the year and the names and associated ranks were successfully extracted.
+    if year is None or not names:
         raise ValueError
 
-    return matches
+    # Sorts the names (and associated ranks) alphabetically in preparation for final output.
+    return year, sorted(names.iteritems())
+
+
+def write_file(file_path, contents):
+    """
+    Writes the contents to the file atomically, by writing to a temporary file
+    within the same directory and then renaming it. Concurrent writers of the
+    same file therefore never leave it partially written (except on Windows,
+    where the existing file is removed prior to renaming).
+    """
+
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=os.path.basename(file_path) + ".", suffix=".tmp")
+
+    # Writes to, closes, and renames the temporary file, removing it in the event of an error.
+    try:
+        with os.fdopen(file_descriptor, "w") as file:
+            file.write(contents)
+
+        os.chmod(temporary_path, 0666 & ~UMASK)
+
+        # Removes the existing file beforehand on Windows, where renaming onto an existing file fails.
+        if os.name == "nt" and os.path.exists(file_path):
+            os.remove(file_path)
+
+        os.rename(temporary_path, file_path)
+    except:
+        os.remove(temporary_path)
+        raise
 
 
 def main():
@@ -68,14 +647,124 @@ def main():
     # Removes the file name of this script from the arguments list.
     del sys.argv[0]
 
+    # Runs the benchmark, if specified, over the specified count of synthetic year files.
+    if "--benchmark" in sys.argv:
+        try:
+            assert sys.argv[0] == "--benchmark" and len(sys.argv) <= 2
+            year_count = int(sys.argv[1]) if len(sys.argv) == 2 else BENCHMARK_YEARS
+            assert year_count > 0
+        except:
+            print "Error. The benchmark argument is malformed."
+            sys.exit(1)
+
+        try:
+            print "\n".join(run_benchmark(year_count))
+        except ValueError:
+            print "Error. The results are inconsistent."
+            sys.exit(1)
+        except EnvironmentError:
+            print "Error. Unable to create (or write to) the benchmark files."
+            sys.exit(1)
+
+        sys.exit(0)
+
+    # Answers the query, if specified, against the database of rankings across years.
+    if "--query" in sys.argv:
+        try:
+            assert sys.argv[0] == "--query"
+            database_path = sys.argv[1]
+            query = sys.argv[2]
+
+            # Determines the query function and its arguments, defaulting the count where it's omitted.
+            if query == "history":
+                assert len(sys.argv) == 4
+                function = query_history
+                arguments = sys.argv[3:]
+            elif query == "top":
+                assert len(sys.argv) in [4, 5]
+                function = query_top
+                arguments = ([int(argument) for argument in sys.argv[3:]] + [QUERY_LIMIT])[:2]
+                assert arguments[-1] > 0
+            else:
+                assert query == "movers" and len(sys.argv) in [5, 6]
+                function = query_movers
+                arguments = ([int(argument) for argument in sys.argv[3:]] + [QUERY_LIMIT])[:3]
+                assert arguments[-1] > 0
+        except:
+            print "Error. The query argument is malformed."
+            sys.exit(1)
+
+        if not os.path.exists(database_path):
+            print "Error. Invalid database path."
+            sys.exit(1)
+
+        try:
+            connection = connect_database(database_path)
+
+            try:
+                results = function(connection, *arguments)
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            print "Error. Unable to query the database."
+            sys.exit(1)
+
+        if results:
+            print "\n".join(results)
+
+        sys.exit(0)
+
+    # Ensures the jobs argument, if specified, is well-formed and valid.
+    jobs = None
+
+    if "--jobs" in sys.argv:
+        try:
+            assert sys.argv[0] == "--jobs"
+            jobs = int(sys.argv[1])
+            assert jobs > 0
+            del sys.argv[:2]
+        except:
+            print "Error. The jobs argument is malformed."
+            sys.exit(1)
+
+    # Ensures the format argument, if specified, is well-formed and valid.
+    output_format = "text"
+
+    if "--format" in sys.argv:
+        try:
+            assert sys.argv[0] == "--format"
+            output_format = sys.argv[1]
+            assert output_format in FORMATS
+            del sys.argv[:2]
+        except:
+            print "Error. The format argument is malformed."
+            sys.exit(1)
+
+        if output_format == "parquet" and not pyarrow:
+            print "Error. The parquet format requires the pyarrow package."
+            sys.exit(1)
+
+    # Ensures the ingest argument, if specified, is well-formed and valid.
+    database_path = None
+
+    if "--ingest" in sys.argv:
+        try:
+            assert sys.argv[0] == "--ingest"
+            assert output_format == "text"
+            database_path = os.path.abspath(sys.argv[1])
+            del sys.argv[:2]
+        except:
+            print "Error. The ingest argument is malformed."
+            sys.exit(1)
+
     # Ensures the limit argument, if specified, is well-formed and valid.
     limit = None
 
     if "--limit" in sys.argv:
         try:
             assert sys.argv[0] == "--limit"
-            # Offsets the limit by 1 to account for the year being the first element within the results list.
-            limit = int(sys.argv[1]) + 1
+            assert not database_path
+            limit = int(sys.argv[1])
             del sys.argv[:2]
         except:
             print "Error. The limit argument is malformed."
@@ -87,12 +776,26 @@ def main():
     if "--save-summary" in sys.argv:
         try:
             assert sys.argv[0] == "--save-summary"
+            assert not database_path
             summary = True
             del sys.argv[0]
         except:
             print "Error. The summary argument is malformed."
             sys.exit(1)
 
+    # Ensures the incremental argument, if specified, is well-formed and valid.
+    incremental = False
+
+    if "--incremental" in sys.argv:
+        try:
+            assert sys.argv[0] == "--incremental"
+            assert summary
+            incremental = True
+            del sys.argv[0]
+        except:
+            print "Error. The incremental argument is malformed."
+            sys.exit(1)
+
     # Ensures that at least one file path has been specified for processing.
     if not sys.argv:
         print "Error. At least one file path must be specified."
@@ -104,46 +807,58 @@ def main():
             print "Error. Invalid file path (or paths)."
             sys.exit(1)
 
-    # Processes each file and generates the results.
-    for file_path in sys.argv:
-        file = None
-
-        # Opens, reads, and closes the file.
-        try:
-            file = open(file_path, "r")
-            file_content = file.read()
-        except:
-            print "Error. Unable to read the file."
-            sys.exit(1)
-        finally:
-            if file:
-                file.close()
+    # Either collects the rankings or processes each file, either serially or across a pool of processes. The outcomes
+    # are reported in the order of the file paths, stopping at the first error.
+    if database_path:
+        function = collect_rankings
+        tasks = sys.argv
+    else:
+        function = process_file
+        tasks = [(file_path, output_format, limit, summary, incremental) for file_path in sys.argv]
 
-        # Generates the results and writes to a file or standard output.
-        try:
-            results = "\n".join(extract_names(file_content)[:limit])
-        except ValueError:
-            print "Error. Invalid file contents. The HTML structure is malformed."
-            sys.exit(1)
+    pool = None
 
-        if summary:
-            in_path, in_file = os.path.split(os.path.abspath(os.path.join(os.getcwd(), file_path)))
+    if jobs is None:
+        outcomes = itertools.imap(function, tasks)
+    else:
+        pool = multiprocessing.Pool(jobs)
+        outcomes = pool.imap(function, tasks)
 
-            file = None
+    try:
+        if database_path:
+            connection = connect_database(database_path)
 
-            # Opens, writes to, and closes the file.
+            # Ingests all of the files within a single transaction, so that a failure leaves the database unchanged.
             try:
-                file = open(os.path.join(in_path, in_file + ".summary"), "w")
-                file.write(results)
-            except:
-                print "Error. Unable to create or write to the file."
-                sys.exit(1)
+                with connection:
+                    for error, rankings in outcomes:
+                        if error:
+                            print error
+                            sys.exit(1)
+
+                        ingest_rankings(connection, rankings)
             finally:
-                if file:
-                    file.close()
+                connection.close()
         else:
-            print results
+            writer = RankingWriter(sys.stdout, output_format)
+
+            try:
+                for error, results in outcomes:
+                    if error:
+                        print error
+                        sys.exit(1)
+
+                    if results is not None:
+                        writer.write(*results)
+            finally:
+                writer.close()
+    except sqlite3.Error:
+        print "Error. Unable to create or write to the database."
+        sys.exit(1)
+    finally:
+        if pool:
+            pool.terminate()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
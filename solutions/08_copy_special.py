@@ -3,61 +3,500 @@ Completed solution for the 'copy special' exercise featured within Google's
 Python course.
 
 This script copies or zips files from specified directories that match the
-pattern __XYZ__ where 'XYZ' can be any combination of alpha characters.
+pattern __XYZ__ where 'XYZ' can be any combination of alpha characters. The
+directories are optionally scanned recursively, and the files are copied or
+zipped as they're found (rather than once every directory has been scanned),
+unless duplicate file names are an error (the default conflict policy).
+
+Files are copied across a pool of threads, using a kernel-side copy (i.e.
+sendfile, on Linux) and skipping files which already exist with an identical
+size and modification time.
+
+Files are zipped (i.e. compressed) optionally across a pool of processes, and
+written to the archive in order. Files which are already compressed (based on
+their extension or entropy) are stored rather than compressed. The archive is
+either appended to, or updated, in which case only new or changed files (based
+on their size and modification time) are written, replacing any existing
+versions.
+
+Files with the same name (within different directories) are handled according
+to the conflict policy, being either 'error' (the default), 'skip' (retains the
+first file), 'rename' (appends a number to the names of subsequent files), or
+'keep-newest' (retains the most recently modified file).
 
 Usage:
-    python 08_copy_special.py [--copy <copy_path>] [--zip <zip_path>] <in_path> [<in_path>]
+    python 08_copy_special.py [--copy <copy_path> [--threads <threads>]] [--zip <zip_path> [--level <level>] [--jobs <jobs>] [--update]] [--recursive] [--on-conflict <policy>] <in_path> [<in_path>]
 """
 
 
+import collections
+import ctypes
+import errno
+import itertools
+import math
+import multiprocessing.pool
 import os
 import re
 import shutil
+import struct
 import sys
+import tempfile
+import time
 import zipfile
+import zlib
 
+# Uses the directory entry scanner of Python 3.5+ (or its backport, if installed), which avoids a separate stat per
+# entry when determining whether the entry is a file or directory.
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
 
-def copy_to(file_paths, out_path):
+# Uses the sendfile system call of Linux (via the C library, as the os module of Python 2 lacks it), which copies
+# between file descriptors within the kernel, rather than through user space. Uses the variant with a 64-bit offset,
+# as the offset of the other variant is only 32-bit on 32-bit platforms.
+sendfile = None
+
+if sys.platform.startswith("linux"):
+    try:
+        sendfile = ctypes.CDLL(None, use_errno=True).sendfile64
+        sendfile.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int64), ctypes.c_size_t]
+        sendfile.restype = ctypes.c_ssize_t
+    except (AttributeError, OSError):
+        sendfile = None
+
+
+CONFLICT_POLICIES = ["error", "skip", "rename", "keep-newest"]
+
+# Copying is I/O (rather than CPU) bound, so the pool is larger than the number of processors.
+COPY_THREADS = 16
+
+# Identifies files which are already compressed, and are therefore stored (rather than compressed) within the archive.
+COMPRESSED_EXTENSIONS = set([".7z", ".avi", ".bz2", ".docx", ".flac", ".gif", ".gz", ".jar", ".jpeg", ".jpg", ".mkv",
+                             ".mov", ".mp3", ".mp4", ".ogg", ".png", ".pptx", ".rar", ".tgz", ".webm", ".webp", ".xlsx",
+                             ".xz", ".zip", ".zst"])
+
+ENTROPY_SAMPLE_SIZE = 64 * 1024  # Unit in bytes.
+ENTROPY_THRESHOLD = 7.5  # Unit in bits per byte.
+
+# Files larger than this are compressed by the archive itself (in chunks) rather than within the pool of processes.
+MEMBER_SIZE_LIMIT = 32 * 1024 * 1024  # Unit in bytes.
+
+# Matches the pattern __XYZ__ where 'XYZ' can be any combination of alpha characters.
+SPECIAL_PATTERN = re.compile(r"__[a-z]+__", re.IGNORECASE)
+
+
+def compress_file(task):
+    """
+    Compresses the file (with the task being a tuple containing the file path
+    and compression level) as a raw deflate stream. Returns a tuple containing
+    the compression type, the CRC, the uncompressed size, and the (compressed or
+    stored) data. The data is None if the file is too large to be compressed
+    in memory, in which case it's left to the archive.
+    """
+
+    file_path, level = task
+
+    # Reads only the sample of the file (to determine whether it's already compressed) if it's too large.
+    with open(file_path, "rb") as file:
+        large = os.fstat(file.fileno()).st_size > MEMBER_SIZE_LIMIT
+        data = file.read(ENTROPY_SAMPLE_SIZE if large else -1)
+
+    compress_type = zipfile.ZIP_DEFLATED if level and not is_compressed(file_path, data[:ENTROPY_SAMPLE_SIZE]) else zipfile.ZIP_STORED
+
+    if large:
+        return compress_type, None, None, None
+
+    crc = zlib.crc32(data) & 0xffffffff
+
+    # Stores the file if compressing it doesn't reduce its size.
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed_data = compressor.compress(data) + compressor.flush()
+
+        if len(compressed_data) < len(data):
+            return compress_type, crc, len(data), compressed_data
+
+    return zipfile.ZIP_STORED, crc, len(data), data
+
+
+def copy_file(file_path):
+    """
+    Copies the file (with the file path being a tuple containing the source and
+    destination paths), along with its permissions and modification time. The
+    copy is performed by the kernel where supported, rather than through user
+    space. Returns the number of bytes copied, or None if the destination
+    already exists with an identical size and modification time.
+    """
+
+    source_path, destination_path = file_path
+    source_status = os.stat(source_path)
+
+    # Skips the file if it's unchanged since it was last copied.
+    try:
+        destination_status = os.stat(destination_path)
+
+        if destination_status.st_size == source_status.st_size and int(destination_status.st_mtime) == int(source_status.st_mtime):
+            return None
+    except OSError:
+        pass
+
+    copied = False
+
+    # Copies the file using a kernel-side copy, if supported.
+    if sendfile:
+        with open(source_path, "rb") as source, open(destination_path, "wb") as destination:
+            # Advanced by the kernel as the file is copied.
+            offset = ctypes.c_int64(0)
+
+            try:
+                while offset.value < source_status.st_size:
+                    count = sendfile(destination.fileno(), source.fileno(), ctypes.byref(offset), source_status.st_size - offset.value)
+
+                    if count < 0:
+                        error_number = ctypes.get_errno()
+
+                        # Retries if the copy was interrupted by a signal.
+                        if error_number != errno.EINTR:
+                            raise OSError(error_number, os.strerror(error_number), source_path)
+
+                    # Ensures that a file which shrinks whilst being copied doesn't result in an infinite loop.
+                    elif not count:
+                        break
+
+                copied = True
+            except OSError as error:
+                # Falls back if the kernel (or file system) doesn't support the copy, but only prior to copying.
+                if offset.value or error.errno not in [errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP]:
+                    raise
+
+    if not copied:
+        shutil.copyfile(source_path, destination_path)
+
+    shutil.copystat(source_path, destination_path)
+
+    return source_status.st_size
+
+
+def copy_to(file_paths, out_path, threads=COPY_THREADS):
     """
     Copies (i.e. writes) each file specified within the list of file paths (with
-    each file path being a tuple containing the parent directory and file name)
-    to the desired path.
+    each file path being a tuple containing the parent directory, file name, and
+    output file name) to the desired path, across a pool of threads. Returns a
+    tuple containing the number of files copied, the number of (unchanged)
+    files skipped, and the number of bytes copied.
     """
 
-    for directory_path, file_name in file_paths:
-        shutil.copy(os.path.join(directory_path, file_name), out_path)
+    pool = multiprocessing.pool.ThreadPool(threads)
+    pending = collections.deque()
+    file_paths = iter(file_paths)
+    copied_count = 0
+    skipped_count = 0
+    byte_count = 0
+
+    # Bounds the number of pending copies, so that the file paths are consumed (and scanned) as copying progresses.
+    # The file paths are consumed within this thread, so that any error whilst scanning is raised here.
+    try:
+        while True:
+            for directory_path, file_name, out_name in itertools.islice(file_paths, threads * 2 - len(pending)):
+                task = (os.path.join(directory_path, file_name), os.path.join(out_path, out_name))
+                pending.append(pool.apply_async(copy_file, [task]))
+
+            if not pending:
+                break
+
+            count = pending.popleft().get()
 
+            if count is None:
+                skipped_count += 1
+            else:
+                copied_count += 1
+                byte_count += count
+    finally:
+        pool.terminate()
 
-def get_special_paths(directory_path):
+    return copied_count, skipped_count, byte_count
+
+
+def get_special_paths(directory_path, recursive=False):
     """
     Generates and returns a list of file paths (with each file path being a
     tuple containing the parent directory and file name) that match the pattern
     __XYZ__ where 'XYZ' can be any combination of alpha characters.
     """
 
-    file_paths = []
+    return list(iter_special_paths(directory_path, recursive))
+
+
+def is_compressed(file_path, sample):
+    """
+    Determines whether the file is already compressed, based on its extension,
+    or otherwise the entropy of the sample of its contents.
+    """
 
-    for entry in os.listdir(directory_path):
-        # Ensures that the entry is a file (and NOT a directory) and that the name matches the pattern.
-        if os.path.isfile(os.path.join(directory_path, entry)) and re.search(r".*__[a-z]+__.*", entry, re.IGNORECASE):
-            file_paths.append((directory_path, entry))
+    if os.path.splitext(file_path)[1].lower() in COMPRESSED_EXTENSIONS:
+        return True
 
-    return file_paths
+    if not sample:
+        return False
 
+    entropy = 0.0
 
-def zip_to(file_paths, out_path):
+    # Calculates the Shannon entropy of the sample, in bits per byte.
+    for count in [sample.count(chr(byte)) for byte in xrange(256)]:
+        if count:
+            probability = float(count) / len(sample)
+            entropy -= probability * math.log(probability, 2)
+
+    return entropy > ENTROPY_THRESHOLD
+
+
+def iter_special_paths(directory_path, recursive=False):
     """
-    Zips each file specified within the list of file paths (with each file path
-    being a tuple containing the parent directory and file name) into a single
-    combined archive which is written to the desired path.
+    Yields each file path (being a tuple containing the parent directory and
+    file name) that matches the pattern __XYZ__ where 'XYZ' can be any
+    combination of alpha characters, optionally including the subdirectories.
+    Symbolic links to directories aren't followed.
     """
 
-    archive = zipfile.ZipFile(out_path, "a", zipfile.ZIP_DEFLATED, True)
+    directory_paths = [directory_path]
+
+    while directory_paths:
+        directory_path = directory_paths.pop()
+        subdirectory_paths = []
+
+        if scandir:
+            for entry in scandir(directory_path):
+                # Ensures that the entry is a file (and NOT a directory) and that the name matches the pattern.
+                if entry.is_file():
+                    if SPECIAL_PATTERN.search(entry.name):
+                        yield directory_path, entry.name
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    subdirectory_paths.append(entry.path)
+        else:
+            for entry in os.listdir(directory_path):
+                entry_path = os.path.join(directory_path, entry)
+
+                # Ensures that the entry is a file (and NOT a directory) and that the name matches the pattern.
+                if os.path.isfile(entry_path):
+                    if SPECIAL_PATTERN.search(entry):
+                        yield directory_path, entry
+                elif recursive and os.path.isdir(entry_path) and not os.path.islink(entry_path):
+                    subdirectory_paths.append(entry_path)
+
+        # Scans the subdirectories in the order they were found.
+        directory_paths.extend(reversed(subdirectory_paths))
+
+
+def iter_unique_paths(file_paths, policy="error"):
+    """
+    Yields each file path (being a tuple containing the parent directory, file
+    name, and output file name), whilst resolving duplicate file names according
+    to the conflict policy. Takes into consideration the case-insensitive nature
+    of Windows. Raises a ValueError (describing the file name and the colliding
+    directories) upon a duplicate file name if the policy is 'error'.
+    """
+
+    # Maps each (lowercase) output file name to the parent directory of the file.
+    directory_paths = {}
+
+    # Maps each (lowercase) renamed file name to the next number to try, so that used numbers aren't retried.
+    next_numbers = {}
+
+    # Retains the most recently modified file for each file name, which can't be determined until every directory has
+    # been scanned.
+    if policy == "keep-newest":
+        newest_paths = collections.OrderedDict()
+
+        for directory_path, file_name in file_paths:
+            modified_time = os.path.getmtime(os.path.join(directory_path, file_name))
+            key = file_name.lower()
+
+            if key not in newest_paths or modified_time > newest_paths[key][0]:
+                newest_paths[key] = (modified_time, (directory_path, file_name, file_name))
+
+        for _modified_time, file_path in newest_paths.itervalues():
+            yield file_path
+
+        return
 
     for directory_path, file_name in file_paths:
-        archive.write(os.path.join(directory_path, file_name), file_name)
+        out_name = file_name
+        key = out_name.lower()
+
+        if key in directory_paths:
+            if policy == "error":
+                raise ValueError("The file " + repr(file_name) + " is within both " + repr(directory_paths[key]) + " and " + repr(directory_path) + ".")
+
+            if policy == "skip":
+                continue
+
+            # Appends the lowest unused number which results in a unique file name (prior to the file extension).
+            root, extension = os.path.splitext(file_name)
+            number = next_numbers.get(file_name.lower(), 2)
+
+            while key in directory_paths:
+                out_name = root + " (" + str(number) + ")" + extension
+                key = out_name.lower()
+                number += 1
+
+            next_numbers[file_name.lower()] = number
+
+        directory_paths[key] = directory_path
+
+        yield directory_path, file_name, out_name
+
+
+def read_member(archive, member):
+    """
+    Reads and returns the (compressed) data of the member of the archive,
+    without decompressing it.
+    """
+
+    archive.fp.seek(member.header_offset)
+
+    # Skips the file header, including the variable-length file name and extra field.
+    name_length, extra_length = struct.unpack("<HH", archive.fp.read(zipfile.sizeFileHeader)[-4:])
+    archive.fp.seek(name_length + extra_length, 1)
+
+    return archive.fp.read(member.compress_size)
+
+
+def write_member(archive, member, data):
+    """
+    Writes the member (being a ZipInfo object, with its compression type, CRC,
+    and uncompressed size already specified) and its data, which is already
+    compressed, to the archive.
+    """
+
+    member.compress_size = len(data)
+    member.flag_bits &= ~0x08
+    member.header_offset = archive.fp.tell()
+
+    archive._writecheck(member)
+    archive._didModify = True
+
+    zip64 = member.file_size > zipfile.ZIP64_LIMIT or member.compress_size > zipfile.ZIP64_LIMIT
+
+    archive.fp.write(member.FileHeader(zip64))
+    archive.fp.write(data)
+    archive.filelist.append(member)
+    archive.NameToInfo[member.filename] = member
+
+
+def zip_files(archive, file_paths, level, jobs=None):
+    """
+    Zips each file specified within the list of file paths (with each file path
+    being a tuple containing the parent directory, file name, and output file
+    name) into the archive, compressing the files (optionally across a pool of
+    processes) at the compression level. The files are written in order.
+    """
+
+    pool = multiprocessing.Pool(jobs) if jobs else None
+    pending = collections.deque()
+    file_paths = iter(file_paths)
 
-    archive.close()
+    # Bounds the number of pending files, so that the file paths are consumed (and scanned) as zipping progresses. The
+    # file paths are consumed within this process, so that any error whilst scanning is raised here.
+    try:
+        while True:
+            for directory_path, file_name, out_name in itertools.islice(file_paths, (jobs or 1) * 2 - len(pending)):
+                file_path = os.path.join(directory_path, file_name)
+                result = pool.apply_async(compress_file, [(file_path, level)]) if pool else None
+                pending.append((file_path, out_name, result))
+
+            if not pending:
+                break
+
+            file_path, out_name, result = pending.popleft()
+            compress_type, crc, file_size, data = result.get() if result else compress_file((file_path, level))
+
+            if data is None:
+                archive.write(file_path, out_name, compress_type)
+                continue
+
+            file_status = os.stat(file_path)
+
+            member = zipfile.ZipInfo(out_name, time.localtime(file_status.st_mtime)[:6])
+            member.external_attr = (file_status.st_mode & 0xFFFF) << 16
+            member.compress_type = compress_type
+            member.CRC = crc
+            member.file_size = file_size
+
+            write_member(archive, member, data)
+    finally:
+        if pool:
+            pool.terminate()
+
+
+def zip_to(file_paths, out_path, level=zlib.Z_DEFAULT_COMPRESSION, jobs=None, update=False):
+    """
+    Zips each file specified within the list of file paths (with each file path
+    being a tuple containing the parent directory, file name, and output file
+    name) into a single combined archive which is written to the desired path.
+    The archive is either appended to, or updated with only the new or changed
+    files (replacing any existing versions, including the duplicates left by
+    appending).
+    """
+
+    if not update or not zipfile.is_zipfile(out_path):
+        archive = zipfile.ZipFile(out_path, "a", zipfile.ZIP_DEFLATED, True)
+        zip_files(archive, file_paths, level, jobs)
+        archive.close()
+
+        return
+
+    existing_archive = zipfile.ZipFile(out_path, "r")
+
+    try:
+        # Maps each file name to its latest member, as appending can result in several members with the same name.
+        members = dict((member.filename, member) for member in existing_archive.infolist())
+        changed_paths = []
+
+        # Determines the new or changed files, based on their size and modification time (which the archive stores to
+        # a resolution of two seconds).
+        for directory_path, file_name, out_name in file_paths:
+            file_status = os.stat(os.path.join(directory_path, file_name))
+            date_time = time.localtime(file_status.st_mtime)[:6]
+            date_time = date_time[:5] + (date_time[5] // 2 * 2,)
+            member = members.get(out_name)
+
+            if not member or member.file_size != file_status.st_size or member.date_time != date_time:
+                changed_paths.append((directory_path, file_name, out_name))
+
+        # Rewrites the archive regardless if it contains duplicate members, so that they're removed.
+        if not changed_paths and len(members) == len(existing_archive.infolist()):
+            return
+
+        changed_names = set(out_name for _directory_path, _file_name, out_name in changed_paths)
+
+        # Rewrites the archive as a temporary file, copying the unchanged members without recompressing them, and
+        # then replaces the existing archive.
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(out_path), suffix=".zip")
+        os.close(file_descriptor)
+
+        try:
+            archive = zipfile.ZipFile(temporary_path, "w", zipfile.ZIP_DEFLATED, True)
+
+            try:
+                for member in existing_archive.infolist():
+                    if member.filename not in changed_names and members[member.filename] is member:
+                        write_member(archive, member, read_member(existing_archive, member))
+
+                zip_files(archive, changed_paths, level, jobs)
+            finally:
+                archive.close()
+
+            shutil.copymode(out_path, temporary_path)
+            os.rename(temporary_path, out_path)
+        except:
+            os.remove(temporary_path)
+            raise
+    finally:
+        existing_archive.close()
 
 
 def main():
@@ -86,6 +525,20 @@ def main():
             print "Error. Invalid output directory path for the copying operation."
             sys.exit(1)
 
+    # Ensures that the threads argument, if specified, is well-formed and valid.
+    threads = COPY_THREADS
+
+    if "--threads" in sys.argv:
+        try:
+            assert sys.argv[0] == "--threads"
+            assert copy_path
+            threads = int(sys.argv[1])
+            assert threads > 0
+            del sys.argv[:2]
+        except:
+            print "Error. The threads argument is malformed."
+            sys.exit(1)
+
     # Ensures that the zip argument, if specified, is well-formed and valid.
     zip_path = None
 
@@ -108,6 +561,72 @@ def main():
             print "Error. Invalid output file name for the zipping operation."
             sys.exit(1)
 
+    # Ensures that the level argument, if specified, is well-formed and valid. A level of 0 stores the files.
+    level = zlib.Z_DEFAULT_COMPRESSION
+
+    if "--level" in sys.argv:
+        try:
+            assert sys.argv[0] == "--level"
+            assert zip_path
+            level = int(sys.argv[1])
+            assert 0 <= level <= 9
+            del sys.argv[:2]
+        except:
+            print "Error. The level argument is malformed."
+            sys.exit(1)
+
+    # Ensures that the jobs argument, if specified, is well-formed and valid.
+    jobs = None
+
+    if "--jobs" in sys.argv:
+        try:
+            assert sys.argv[0] == "--jobs"
+            assert zip_path
+            jobs = int(sys.argv[1])
+            assert jobs > 0
+            del sys.argv[:2]
+        except:
+            print "Error. The jobs argument is malformed."
+            sys.exit(1)
+
+    # Ensures that the update argument, if specified, is well-formed and valid.
+    update = False
+
+    if "--update" in sys.argv:
+        try:
+            assert sys.argv[0] == "--update"
+            assert zip_path
+            update = True
+            del sys.argv[0]
+        except:
+            print "Error. The update argument is malformed."
+            sys.exit(1)
+
+    # Ensures that the recursive argument, if specified, is well-formed and valid.
+    recursive = False
+
+    if "--recursive" in sys.argv:
+        try:
+            assert sys.argv[0] == "--recursive"
+            recursive = True
+            del sys.argv[0]
+        except:
+            print "Error. The recursive argument is malformed."
+            sys.exit(1)
+
+    # Ensures that the conflict policy argument, if specified, is well-formed and valid.
+    policy = "error"
+
+    if "--on-conflict" in sys.argv:
+        try:
+            assert sys.argv[0] == "--on-conflict"
+            policy = sys.argv[1]
+            assert policy in CONFLICT_POLICIES
+            del sys.argv[:2]
+        except:
+            print "Error. The conflict policy argument is malformed."
+            sys.exit(1)
+
     # Ensures that at least one directory path has been specified for processing.
     if not sys.argv:
         print "Error. At least one directory path must be specified for processing."
@@ -122,44 +641,65 @@ def main():
             print "Error. Invalid directory path (or paths)."
             sys.exit(1)
 
-    # Generates the list of absolute file paths (stored as tuples).
-    file_paths = []
-
-    for directory_path in sys.argv:
-        file_paths += get_special_paths(directory_path)
-
-    # Ensures that there are no duplicate file names. Takes into consideration the case-insensitive nature of Windows.
-    file_names = []
-
-    for _directory_path, file_name in file_paths:
-        file_name = file_name.lower()
+    # Generates the absolute file paths (stored as tuples) as the directories are scanned, so that the files can be
+    # processed before the scanning finishes. Resolves any duplicate file names whilst doing so.
+    file_paths = iter_unique_paths(itertools.chain.from_iterable(iter_special_paths(directory_path, recursive)
+                                                                 for directory_path in sys.argv), policy)
 
-        if file_name in file_names:
-            print "Error. Duplicate file names."
+    # Scans all of the directories beforehand if the file paths are required for both the copying and zipping
+    # operations, or if duplicate file names are an error (so that nothing is copied, zipped, or printed beforehand).
+    if (copy_path and zip_path) or policy == "error":
+        try:
+            file_paths = list(file_paths)
+        except ValueError as error:
+            print "Error. Duplicate file names. " + str(error)
+            sys.exit(1)
+        except:
+            print "Error. Unable to scan the directories due to insufficient permissions."
             sys.exit(1)
-
-        file_names.append(file_name)
 
     # Copies the filtered files, if requested, to the output directory path.
     if copy_path:
         try:
-            copy_to(file_paths, copy_path)
+            start_time = time.time()
+            copied_count, skipped_count, byte_count = copy_to(file_paths, copy_path, threads)
+            seconds = time.time() - start_time
+        except ValueError as error:
+            print "Error. Duplicate file names. " + str(error)
+            sys.exit(1)
         except:
             print "Error. Unable to copy the files to the output directory due to insufficient permissions."
             sys.exit(1)
 
+        print "Copied %d files (%d bytes) in %.2f seconds (%d bytes/second). Skipped %d unchanged files." % (
+            copied_count, byte_count, seconds, byte_count / max(seconds, 0.001), skipped_count)
+
     # Zips the filtered files, if requested, to the output file path.
     if zip_path:
         try:
-            zip_to(file_paths, zip_path)
+            zip_to(file_paths, zip_path, level, jobs, update)
+        except ValueError as error:
+            print "Error. Duplicate file names. " + str(error)
+            sys.exit(1)
         except:
-            print "Error. Unable to create (or append to) the ZIP archive due to insufficient permissions."
+            print "Error. Unable to create (or append to, or update) the ZIP archive due to insufficient permissions."
             sys.exit(1)
 
     # Prints the filtered file paths, but only if the copying and zipping operations haven't been specified.
     if not copy_path and not zip_path:
-        for file_path in file_paths:
-            print file_path
+        try:
+            for directory_path, file_name, out_name in file_paths:
+                # Includes the output file name only if the file is renamed.
+                if out_name == file_name:
+                    print (directory_path, file_name)
+                else:
+                    print (directory_path, file_name, out_name)
+        except ValueError as error:
+            print "Error. Duplicate file names. " + str(error)
+            sys.exit(1)
+        except EnvironmentError:
+            print "Error. Unable to scan the directories due to insufficient permissions."
+            sys.exit(1)
 
     # OK.
     sys.exit(0)
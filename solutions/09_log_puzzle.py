@@ -6,21 +6,461 @@ This script extracts the server name and a list of image URLs from an Apache web
 server log file, downloads the images, and then assembles them within a
 generated HTML document to solve the puzzle.
 
+The images are downloaded concurrently (across a pool of threads sharing a pool
+of connections), whilst limiting the rate of requests to each host. Each image
+is streamed to a temporary file which is then renamed, and images which were
+downloaded previously (and are unchanged, based on their size and ETag) are
+skipped, so that an interrupted run can be resumed. Failed requests are retried
+with exponential backoff.
+
+The log file is scanned line by line (rather than being read into memory), and
+can optionally be compressed with gzip (e.g. a rotated log file). Multiple log
+files (e.g. from several servers) can be specified, either as paths, patterns,
+or directories, which are scanned in parallel across a pool of processes (the
+largest first) and the image URLs merged (retaining a single URL per image).
+
+Alternatively, the stats mode scans log files in the combined log format and
+computes the requests per path, status, and client, the bytes served, and the
+percentiles of the response sizes within each time window. The stats are
+written as JSON, and consist solely of counters and quantile sketches, so that
+the stats from separate log files (or shards) can be merged exactly, as though
+the log files had been scanned together.
+
 Usage:
-    python 09_log_puzzle.py --out <out_path> <log_path>
+    python 09_log_puzzle.py --out <out_path> [--jobs <jobs>] [--rate <rate>] [--processes <processes>] <log_path> [<log_path> ...]
+    python 09_log_puzzle.py --stats <stats_path> [--window <window>] [--processes <processes>] <log_path> [<log_path> ...]
+    python 09_log_puzzle.py --merge <stats_path> <shard_path> [<shard_path> ...]
 """
 
 
+import calendar
+import collections
+import functools
+import glob
+import gzip
+import heapq
+import io
+import json
+import math
+import multiprocessing
+import multiprocessing.pool
 import os
 import re
 import requests
 import sys
+import tempfile
+import threading
+import time
+import urlparse
+
+
+DOWNLOAD_ATTEMPTS = 4
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # Unit in bytes.
+
+DOWNLOAD_THREADS = 8
+
+DOWNLOAD_TIMEOUT = 30  # Unit in seconds.
+
+HOST_RATE_LIMIT = 20.0  # Unit in requests per second.
+
+PERCENTILES = [0.5, 0.9, 0.99]
+
+RETRY_DELAY = 0.5  # Unit in seconds. Doubles after each failed attempt.
+
+SKETCH_ACCURACY = 0.01  # Relative error of the quantiles.
+
+STATS_LIMIT = 10
+
+STATS_WINDOW = 3600  # Unit in seconds.
+
+# Identifies a log file which is compressed with gzip.
+GZIP_MAGIC = "\x1f\x8b"
+
+# Matches the path of an image URL within a request line of the log file.
+URL_PATTERN = re.compile(r"get\s+(.*puzzle.*)\s+http", re.IGNORECASE)
+
+# Matches the client, timestamp, path, status, and size within a line of a log file in the combined log format.
+LOG_PATTERN = re.compile(r'(\S+) \S+ \S+ \[(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2} [+-]\d{4})\] "\S+ (\S+)[^"]*" (\d{3}) (\d+|-)')
+
+# Matches the non-ASCII (and control) characters within a path or client, which are escaped so that the stats are
+# serializable as JSON, and compare identically once read back.
+UNSAFE_PATTERN = re.compile(r"[^\x20-\x7e]")
+
+MONTHS = dict((month, index) for index, month in enumerate(["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"], 1))
+
+# Indicates a temporary failure (i.e. a request timeout, rate limiting, or server error), so the request is retried.
+RETRY_STATUS_CODES = set([408, 429, 500, 502, 503, 504])
+
+
+class LogStats(object):
+    """
+    Aggregates the stats of Apache web server log files, in the combined log
+    format. Consists solely of counters and quantile sketches (per time
+    window), so that the stats are compact and can be merged exactly.
+    """
+
+    def __init__(self, window=STATS_WINDOW):
+        self.window = window
+        self.requests = 0
+        self.malformed = 0
+        self.bytes = 0
+        self.paths = collections.Counter()
+        self.path_bytes = collections.Counter()
+        self.statuses = collections.Counter()
+        self.clients = collections.Counter()
+        self.windows = {}
+        self.timestamp = None
+        self.window_start = None
+
+    def add(self, line):
+        """
+        Parses the line of the log file and adds the request to the stats.
+        """
+
+        match = LOG_PATTERN.match(line)
+
+        if not match:
+            self.malformed += 1
+            return
+
+        client, timestamp, path, status, size = match.groups()
+        size = 0 if size == "-" else int(size)
+
+        # Parses the timestamp only when it changes, as consecutive requests typically share it.
+        if timestamp != self.timestamp:
+            try:
+                self.window_start = parse_timestamp(timestamp) // self.window * self.window
+            except (IndexError, KeyError, ValueError):
+                self.malformed += 1
+                return
+
+            self.timestamp = timestamp
+
+        if self.window_start not in self.windows:
+            self.windows[self.window_start] = [0, 0, QuantileSketch()]
+
+        window_stats = self.windows[self.window_start]
+        window_stats[0] += 1
+        window_stats[1] += size
+        window_stats[2].add(size)
+
+        # Excludes the query string, so that the paths don't vary per request.
+        path = escape(path.split("?", 1)[0])
+        client = escape(client)
+
+        self.requests += 1
+        self.bytes += size
+        self.paths[path] += 1
+        self.path_bytes[path] += size
+        self.statuses[status] += 1
+        self.clients[client] += 1
+
+    @classmethod
+    def from_dict(cls, stats_dict):
+        """
+        Creates and returns the stats from their dictionary representation.
+        """
+
+        stats = cls(stats_dict["window"])
+        stats.requests = stats_dict["requests"]
+        stats.malformed = stats_dict["malformed"]
+        stats.bytes = stats_dict["bytes"]
+
+        for name in ["paths", "path_bytes", "statuses", "clients"]:
+            getattr(stats, name).update(stats_dict[name])
+
+        for window_start, (requests, size, sketch_dict) in stats_dict["windows"].iteritems():
+            stats.windows[int(window_start)] = [requests, size, QuantileSketch.from_dict(sketch_dict)]
+
+        return stats
+
+    def merge(self, other):
+        """
+        Merges the stats of another instance into this instance. Raises a
+        ValueError if the time windows differ.
+        """
+
+        if other.window != self.window:
+            raise ValueError
+
+        self.requests += other.requests
+        self.malformed += other.malformed
+        self.bytes += other.bytes
+        self.paths.update(other.paths)
+        self.path_bytes.update(other.path_bytes)
+        self.statuses.update(other.statuses)
+        self.clients.update(other.clients)
+
+        for window_start, (requests, size, sketch) in other.windows.iteritems():
+            if window_start not in self.windows:
+                self.windows[window_start] = [0, 0, QuantileSketch(sketch.accuracy)]
+
+            window_stats = self.windows[window_start]
+            window_stats[0] += requests
+            window_stats[1] += size
+            window_stats[2].merge(sketch)
+
+    def summarize(self, limit=STATS_LIMIT):
+        """
+        Generates and returns a list of lines summarising the stats, including
+        the most frequent paths, statuses, and clients, and the percentiles of
+        the response sizes within each time window.
+        """
+
+        lines = ["Requests: %d (%d malformed lines)" % (self.requests, self.malformed), "Bytes: %d" % self.bytes]
+
+        for title, counter in [("paths", self.paths), ("statuses", self.statuses), ("clients", self.clients)]:
+            lines.append("")
+            lines.append("Top " + title + ":")
+            lines.extend("%12d  %s" % (count, key) for key, count in heapq.nsmallest(limit, counter.iteritems(), key=lambda item: (-item[1], item[0])))
+
+        lines.append("")
+        lines.append("Windows:")
+
+        for window_start, (requests, size, sketch) in sorted(self.windows.iteritems()):
+            percentiles = "  ".join("p%g=%.0f" % (percentile * 100, sketch.quantile(percentile)) for percentile in PERCENTILES)
+            lines.append("%s  %10d requests  %14d bytes  %s" % (time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(window_start)), requests, size, percentiles))
+
+        return lines
+
+    def to_dict(self):
+        """
+        Generates and returns the dictionary representation of the stats
+        (which is serializable as JSON).
+        """
+
+        return {
+            "window": self.window,
+            "requests": self.requests,
+            "malformed": self.malformed,
+            "bytes": self.bytes,
+            "paths": self.paths,
+            "path_bytes": self.path_bytes,
+            "statuses": self.statuses,
+            "clients": self.clients,
+            "windows": dict((str(window_start), [requests, size, sketch.to_dict()]) for window_start, (requests, size, sketch) in self.windows.iteritems())
+        }
+
+
+class QuantileSketch(object):
+    """
+    Estimates the quantiles of a stream of non-negative values, within a
+    relative error, by counting the values within logarithmically sized
+    buckets. The buckets are independent of the order of the values, so that
+    sketches can be merged exactly.
+    """
+
+    def __init__(self, accuracy=SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.count = 0
+        self.zero_count = 0
+        self.buckets = collections.Counter()
+
+    def add(self, value):
+        """
+        Adds the value to the sketch.
+        """
+
+        self.count += 1
+
+        if value <= 0:
+            self.zero_count += 1
+        else:
+            self.buckets[int(math.ceil(math.log(value) / self.log_gamma))] += 1
+
+    @classmethod
+    def from_dict(cls, sketch_dict):
+        """
+        Creates and returns the sketch from its dictionary representation.
+        """
+
+        sketch = cls(sketch_dict["accuracy"])
+        sketch.zero_count = sketch_dict["zero_count"]
+        sketch.buckets.update(dict((int(index), count) for index, count in sketch_dict["buckets"].iteritems()))
+        sketch.count = sketch.zero_count + sum(sketch.buckets.itervalues())
+
+        return sketch
+
+    def merge(self, other):
+        """
+        Merges another sketch into this sketch. Raises a ValueError if the
+        accuracies differ.
+        """
+
+        if other.accuracy != self.accuracy:
+            raise ValueError
+
+        self.count += other.count
+        self.zero_count += other.zero_count
+        self.buckets.update(other.buckets)
+
+    def quantile(self, quantile):
+        """
+        Returns the estimated value at the quantile (between 0 and 1), or None
+        if the sketch is empty.
+        """
+
+        if not self.count:
+            return None
+
+        rank = quantile * (self.count - 1)
+        cumulative_count = self.zero_count
+
+        if rank < cumulative_count:
+            return 0
+
+        for index in sorted(self.buckets):
+            cumulative_count += self.buckets[index]
+
+            if rank < cumulative_count:
+                break
+
+        # Returns the midpoint (in terms of relative error) of the bucket.
+        return 2 * self.gamma ** index / (self.gamma + 1)
 
+    def to_dict(self):
+        """
+        Generates and returns the dictionary representation of the sketch
+        (which is serializable as JSON).
+        """
 
-def download_images(image_urls, out_path):
+        return {"accuracy": self.accuracy, "zero_count": self.zero_count, "buckets": dict((str(index), count) for index, count in self.buckets.iteritems())}
+
+
+class RateLimiter(object):
+    """
+    Limits the rate of requests to each host, by spacing the requests evenly
+    regardless of the thread making them.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.request_times = {}
+
+    def wait(self, url):
+        """
+        Blocks until the next request can be made to the host of the URL.
+        """
+
+        host = urlparse.urlparse(url).netloc
+
+        # Reserves the next available time for the host, and then sleeps (without holding the lock) until it.
+        with self.lock:
+            now = time.time()
+            request_time = max(now, self.request_times.get(host, now))
+            self.request_times[host] = request_time + self.interval
+
+        if request_time > now:
+            time.sleep(request_time - now)
+
+
+def analyze_log(log_path, window=STATS_WINDOW):
+    """
+    Computes and returns the stats of the Apache web server log file, whilst
+    scanning it. Invoked within a worker process.
+    """
+
+    stats = LogStats(window)
+
+    for line in read_log(log_path):
+        stats.add(line)
+
+    return stats
+
+
+def analyze_logs(log_paths, window=STATS_WINDOW, processes=None):
+    """
+    Computes and returns the stats of the Apache web server log files, which
+    are scanned in parallel across a pool of processes (the largest first), and
+    then merged.
+    """
+
+    stats = LogStats(window)
+
+    # Avoids the overhead of a pool of processes when there's only a single log file.
+    if len(log_paths) == 1 or processes == 1:
+        for log_path in log_paths:
+            stats.merge(analyze_log(log_path, window))
+
+        return stats
+
+    log_paths = sorted(log_paths, key=os.path.getsize, reverse=True)
+    pool = multiprocessing.Pool(min(processes or multiprocessing.cpu_count(), len(log_paths)))
+
+    # Merges the stats from each log file, stopping at the first error.
+    try:
+        for result in [pool.apply_async(analyze_log, (log_path, window)) for log_path in log_paths]:
+            stats.merge(result.get())
+    finally:
+        pool.terminate()
+
+    return stats
+
+
+def download_image(session, rate_limiter, out_path, image_url):
+    """
+    Downloads the image specified by the URL (using the session, subject to the
+    rate limiter) and writes it to the desired path, unless it was downloaded
+    previously and is unchanged. Failed requests are retried with exponential
+    backoff.
+    """
+
+    image_path = os.path.join(out_path, os.path.basename(image_url))
+    etag_path = os.path.join(out_path, "." + os.path.basename(image_url) + ".etag")
+    error = requests.exceptions.ConnectionError
+
+    for attempt in xrange(DOWNLOAD_ATTEMPTS):
+        # Backs off exponentially prior to retrying.
+        if attempt:
+            time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+
+        try:
+            # Skips the image if it was downloaded previously, and is unchanged.
+            if os.path.exists(image_path):
+                rate_limiter.wait(image_url)
+                response = session.head(image_url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+
+                if response.status_code == 200 and is_unchanged(response, image_path, etag_path):
+                    return
+
+            rate_limiter.wait(image_url)
+            response = session.get(image_url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        except requests.exceptions.RequestException:
+            error = requests.exceptions.ConnectionError
+            continue
+
+        try:
+            if response.status_code in RETRY_STATUS_CODES:
+                error = requests.exceptions.HTTPError
+                continue
+
+            if response.status_code != 200:
+                raise requests.exceptions.HTTPError
+
+            try:
+                write_image(response, image_path, etag_path)
+            except requests.exceptions.RequestException:
+                error = requests.exceptions.ConnectionError
+                continue
+
+            return
+        finally:
+            response.close()
+
+    raise error
+
+
+def download_images(image_urls, out_path, jobs=DOWNLOAD_THREADS, rate=HOST_RATE_LIMIT):
     """
     Downloads the images specified within the list of URLs and writes them to
-    the desired path (presumably, on non-volatile storage).
+    the desired path (presumably, on non-volatile storage). The images are
+    downloaded across a pool of threads, which share a session (so that the
+    connections to each host are kept alive and reused), whilst limiting the
+    rate of requests to each host.
     """
 
     # Creates the out path if it doesn't already exist.
@@ -28,37 +468,78 @@ def download_images(image_urls, out_path):
     if not os.path.exists(out_path):
         os.makedirs(out_path)
 
-    # Downloads each image from the specified URL.
-    for image_url in image_urls:
-        try:
-            response = requests.get(image_url)
-        except:
-            raise requests.exceptions.ConnectionError
+    # Sizes the pool of connections (per host) to match the pool of threads.
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=jobs)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
 
-        if response.status_code != 200:
-            raise requests.exceptions.HTTPError
+    pool = multiprocessing.pool.ThreadPool(jobs)
 
-        # Writes each image to the out path.
-        image_file = None
+    # Downloads each image from the specified URL, stopping at the first error.
+    try:
+        for _ in pool.imap_unordered(functools.partial(download_image, session, RateLimiter(rate), out_path), image_urls):
+            pass
+    finally:
+        pool.terminate()
+        session.close()
 
-        try:
-            image_file = open(os.path.join(out_path, os.path.basename(image_url)), "wb")
-            image_file.write(response.content)
-        except:
-            raise IOError
-        finally:
-            if image_file:
-                image_file.close()
+
+def escape(text):
+    """
+    Returns the text with any non-ASCII (or control) characters percent-encoded
+    (e.g. "/caf\\xe9" becomes "/caf%E9").
+    """
+
+    if not UNSAFE_PATTERN.search(text):
+        return text
+
+    return UNSAFE_PATTERN.sub(lambda match: "%%%02X" % ord(match.group()), text)
+
+
+def expand_log_paths(log_arguments):
+    """
+    Expands and returns a list of log file paths based on the arguments, which
+    can be paths, patterns, or directories (in which case, only the files which
+    follow the log file naming convention are included). Duplicate paths are
+    removed, whilst retaining their order. Raises an IOError if an argument
+    doesn't match any file.
+    """
+
+    log_paths = []
+
+    for log_argument in log_arguments:
+        matched_paths = sorted(glob.glob(log_argument))
+
+        if not matched_paths:
+            raise IOError(log_argument)
+
+        for matched_path in matched_paths:
+            if not os.path.isdir(matched_path):
+                log_paths.append(os.path.abspath(matched_path))
+                continue
+
+            for file_name in sorted(os.listdir(matched_path)):
+                file_path = os.path.join(matched_path, file_name)
+
+                if not file_name.startswith(".") and os.path.isfile(file_path) and re.search(r"_[a-z.]+", file_name, re.IGNORECASE):
+                    log_paths.append(os.path.abspath(file_path))
+
+    # Removes any duplicate paths (e.g. when a pattern and a directory overlap).
+    unique_paths = set()
+
+    return [log_path for log_path in log_paths if not (log_path in unique_paths or unique_paths.add(log_path))]
 
 
 def extract_server_name(log_path):
     """
     Extracts the server name from the Apache web server log file name. This
     relies on the convention that the server name is preceded by an initial
-    underscore.
+    underscore. The file extension of a log file compressed with gzip is
+    disregarded.
     """
 
-    match = re.search(r"_([a-z.]+)", os.path.basename(log_path), re.IGNORECASE)
+    match = re.search(r"_([a-z.]+)", re.sub(r"\.gz$", "", os.path.basename(log_path)), re.IGNORECASE)
 
     if match:
         return match.group(1)
@@ -73,7 +554,7 @@ def extract_urls(server_name, log_content):
     final word pattern (excluding the file extension).
     """
 
-    return sorted(set(["https://" + server_name + path for path in re.findall(r"get\s+(.*puzzle.*)\s+http", log_content, re.IGNORECASE)]), key=lambda url: str.split(str.replace(url, ".", "-"), "-")[-2])
+    return scan_urls(server_name, log_content.splitlines())
 
 
 def generate_html(image_urls, out_path):
@@ -102,19 +583,364 @@ def generate_html(image_urls, out_path):
             html_file.close()
 
 
+def is_unchanged(response, image_path, etag_path):
+    """
+    Determines whether the image (which was downloaded previously) is unchanged,
+    based on the Content-Length and ETag headers of the response (where
+    specified) matching the size and recorded ETag of the image.
+    """
+
+    # Disregards the Content-Length header if the image is encoded (e.g. compressed) for transfer.
+    content_length = None if "Content-Encoding" in response.headers else response.headers.get("Content-Length")
+    etag = response.headers.get("ETag")
+
+    if content_length is None and etag is None:
+        return False
+
+    if content_length is not None and int(content_length) != os.path.getsize(image_path):
+        return False
+
+    if etag is not None:
+        etag_file = None
+
+        # Opens, reads, and closes the file.
+        try:
+            etag_file = open(etag_path, "r")
+            return etag_file.read() == etag
+        except IOError:
+            return False
+        finally:
+            if etag_file:
+                etag_file.close()
+
+    return True
+
+
+def parse_timestamp(timestamp):
+    """
+    Parses and returns the timestamp of a log file line (e.g. "10/Oct/2000:13:55:36
+    -0700") as seconds since the epoch. Avoids the comparatively slow strptime.
+    """
+
+    offset = int(timestamp[22:24]) * 3600 + int(timestamp[24:26]) * 60
+
+    if timestamp[21] == "-":
+        offset = -offset
+
+    return calendar.timegm((int(timestamp[7:11]), MONTHS[timestamp[3:6]], int(timestamp[0:2]), int(timestamp[12:14]),
+                            int(timestamp[15:17]), int(timestamp[18:20]))) - offset
+
+
+def read_log(log_path):
+    """
+    Yields each line of the Apache web server log file, which is decompressed if
+    it's compressed with gzip.
+    """
+
+    log_file = None
+
+    # Opens, reads (line by line), and closes the file.
+    try:
+        log_file = open(log_path, "rb")
+
+        # Buffers the decompressed file, as reading lines directly from a gzip file is slow.
+        if log_file.read(len(GZIP_MAGIC)) == GZIP_MAGIC:
+            log_file.close()
+            log_file = io.BufferedReader(gzip.open(log_path, "rb"))
+        else:
+            log_file.seek(0)
+
+        for line in log_file:
+            yield line
+    finally:
+        if log_file:
+            log_file.close()
+
+
+def read_stats(stats_path):
+    """
+    Reads and returns the stats from the JSON file.
+    """
+
+    stats_file = None
+
+    # Opens, reads, and closes the file.
+    try:
+        stats_file = open(stats_path, "r")
+        return LogStats.from_dict(json.load(stats_file))
+    finally:
+        if stats_file:
+            stats_file.close()
+
+
+def scan_log(server_name, log_path):
+    """
+    Extracts and returns a list of image URLs from the Apache web server log
+    file, whilst scanning it. Invoked within a worker process.
+    """
+
+    return scan_urls(server_name, read_log(log_path))
+
+
+def scan_logs(logs, processes=None):
+    """
+    Extracts and returns a list of image URLs from the Apache web server log
+    files (specified as a list of server name and log path pairs), which are
+    scanned in parallel across a pool of processes. The largest log files are
+    scanned first, so that the overall duration approaches that of the largest
+    log file. The image URLs are merged, retaining a single URL per image (i.e.
+    file name), from the earliest log file in which it occurs, as the same image
+    is typically served by several servers.
+    """
+
+    # Avoids the overhead of a pool of processes when there's only a single log file.
+    if len(logs) == 1 or processes == 1:
+        log_urls = [scan_log(server_name, log_path) for server_name, log_path in logs]
+    else:
+        pool = multiprocessing.Pool(min(processes or multiprocessing.cpu_count(), len(logs)))
+
+        # Scans the log files from largest to smallest, stopping at the first error.
+        try:
+            results = dict((index, pool.apply_async(scan_log, logs[index]))
+                           for index in sorted(range(len(logs)), key=lambda index: os.path.getsize(logs[index][1]), reverse=True))
+            log_urls = [results[index].get() for index in range(len(logs))]
+        finally:
+            pool.terminate()
+
+    # Merges the image URLs (in the order of the log files), preventing duplicate images.
+    image_urls = {}
+
+    for urls in log_urls:
+        for url in urls:
+            image_urls.setdefault(os.path.basename(url), url)
+
+    return sort_urls(image_urls.values())
+
+
+def scan_urls(server_name, log_lines):
+    """
+    Extracts and returns a list of image URLs from the lines of the Apache web
+    server log file. Only the unique paths are retained whilst consuming the
+    lines, and the URLs are sorted based on the final word pattern (excluding
+    the file extension).
+    """
+
+    paths = set()
+
+    for line in log_lines:
+        # Avoids matching the pattern against the (vast majority of) lines which can't match.
+        if "puzzle" not in line.lower():
+            continue
+
+        match = URL_PATTERN.search(line)
+
+        if match:
+            paths.add(match.group(1))
+
+    return sort_urls(["https://" + server_name + path for path in paths])
+
+
+def sort_urls(image_urls):
+    """
+    Sorts and returns a list of the image URLs based on the final word pattern
+    (excluding the file extension), and then the URL itself (so that the order
+    is consistent when the image URLs are merged from several servers).
+    """
+
+    return sorted(image_urls, key=lambda url: (str.split(str.replace(url, ".", "-"), "-")[-2], url))
+
+
+def write_image(response, image_path, etag_path):
+    """
+    Streams the image from the response to a temporary file, in chunks, which
+    is then renamed (so that the image is never partially written). Records the
+    ETag of the image, if specified. Raises a ConnectionError if the image is
+    incomplete.
+    """
+
+    out_path, image_name = os.path.split(image_path)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=out_path, prefix="." + image_name + ".", suffix=".tmp")
+    size = 0
+
+    try:
+        with os.fdopen(file_descriptor, "wb") as image_file:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                image_file.write(chunk)
+                size += len(chunk)
+
+        # Ensures that the connection wasn't closed before the image was complete (unless the image is encoded, e.g.
+        # compressed, for transfer, in which case the Content-Length header doesn't reflect its size).
+        content_length = None if "Content-Encoding" in response.headers else response.headers.get("Content-Length")
+
+        if content_length is not None and int(content_length) != size:
+            raise requests.exceptions.ConnectionError
+
+        os.chmod(temporary_path, 0644)
+        os.rename(temporary_path, image_path)
+    except requests.exceptions.RequestException:
+        os.remove(temporary_path)
+        raise
+    except:
+        os.remove(temporary_path)
+        raise IOError
+
+    etag = response.headers.get("ETag")
+
+    if etag is None:
+        return
+
+    etag_file = None
+
+    # Opens, writes to, and closes the file.
+    try:
+        etag_file = open(etag_path, "w")
+        etag_file.write(etag)
+    except:
+        raise IOError
+    finally:
+        if etag_file:
+            etag_file.close()
+
+
+def write_stats(stats, stats_path):
+    """
+    Writes the stats to a temporary file, as JSON, which is then renamed (so
+    that the stats are never partially written).
+    """
+
+    directory_path, stats_name = os.path.split(os.path.abspath(stats_path))
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory_path, prefix="." + stats_name + ".", suffix=".tmp")
+
+    try:
+        with os.fdopen(file_descriptor, "w") as stats_file:
+            # Encodes the stats in a single pass, as only then is the (comparatively fast) C encoder used.
+            stats_file.write(json.dumps(stats.to_dict()))
+
+        os.chmod(temporary_path, 0644)
+        os.rename(temporary_path, stats_path)
+    except EnvironmentError:
+        os.remove(temporary_path)
+        raise IOError
+    except:
+        os.remove(temporary_path)
+        raise
+
+
 def main():
     """
     Uses magic to solve the puzzle.
     """
 
     # Ensures the argument count is valid.
-    if len(sys.argv) != 4:
+    if len(sys.argv) < 4:
         print "Error. Invalid argument count."
         sys.exit(1)
 
     # Removes the file name of this script from the arguments list.
     del sys.argv[0]
 
+    # Merges the stats of the shards, if specified, and writes them to the stats path.
+    if "--merge" in sys.argv:
+        try:
+            assert sys.argv[0] == "--merge"
+            stats_path = sys.argv[1]
+            shard_paths = sys.argv[2:]
+            assert shard_paths
+        except (AssertionError, IndexError):
+            print "Error. The merge argument is malformed."
+            sys.exit(1)
+
+        stats = None
+
+        try:
+            print "Merging the stats from " + str(len(shard_paths)) + " shard(s)..."
+
+            for shard_path in shard_paths:
+                shard_stats = read_stats(shard_path)
+
+                if stats:
+                    stats.merge(shard_stats)
+                else:
+                    stats = shard_stats
+        except IOError:
+            print "Error. Unable to open (or read) the shard file."
+            sys.exit(1)
+        except (KeyError, TypeError, ValueError):
+            print "Error. The shard files are malformed (or have differing windows)."
+            sys.exit(1)
+
+        try:
+            write_stats(stats, stats_path)
+        except IOError:
+            print "Error. Unable to create (or write to) the stats file due to insufficient permissions."
+            sys.exit(1)
+
+        print "\n".join(stats.summarize())
+        sys.exit(0)
+
+    # Computes the stats of the log files, if specified, and writes them to the stats path.
+    if "--stats" in sys.argv:
+        try:
+            assert sys.argv[0] == "--stats"
+            stats_path = sys.argv[1]
+            del sys.argv[:2]
+        except (AssertionError, IndexError):
+            print "Error. The stats argument is malformed."
+            sys.exit(1)
+
+        # Ensures that the window argument, if specified, is well-formed and valid.
+        window = STATS_WINDOW
+
+        if "--window" in sys.argv:
+            try:
+                assert sys.argv[0] == "--window"
+                window = int(sys.argv[1])
+                assert window > 0
+                del sys.argv[:2]
+            except (AssertionError, IndexError, ValueError):
+                print "Error. The window argument is malformed."
+                sys.exit(1)
+
+        # Ensures that the processes argument, if specified, is well-formed and valid.
+        processes = None
+
+        if "--processes" in sys.argv:
+            try:
+                assert sys.argv[0] == "--processes"
+                processes = int(sys.argv[1])
+                assert processes > 0
+                del sys.argv[:2]
+            except (AssertionError, IndexError, ValueError):
+                print "Error. The processes argument is malformed."
+                sys.exit(1)
+
+        # Ensures that the log file paths are valid (i.e. exist).
+        try:
+            log_paths = expand_log_paths(sys.argv)
+        except IOError as error:
+            print "Error. Invalid path for the log file: " + str(error)
+            sys.exit(1)
+
+        if not log_paths:
+            print "Error. No log files were found."
+            sys.exit(1)
+
+        try:
+            print "Computing the stats of " + str(len(log_paths)) + " log file(s)..."
+            stats = analyze_logs(log_paths, window, processes)
+        except IOError:
+            print "Error. Unable to open (or read) the log file."
+            sys.exit(1)
+
+        try:
+            write_stats(stats, stats_path)
+        except IOError:
+            print "Error. Unable to create (or write to) the stats file due to insufficient permissions."
+            sys.exit(1)
+
+        print "\n".join(stats.summarize())
+        sys.exit(0)
+
     # Ensures that the out argument is specified.
     if "--out" not in sys.argv:
         print "Error. The out argument must be specified."
@@ -134,41 +960,80 @@ def main():
         print "Error. Invalid path for the output directory."
         sys.exit(1)
 
+    # Ensures that the jobs argument, if specified, is well-formed and valid.
+    jobs = DOWNLOAD_THREADS
+
+    if "--jobs" in sys.argv:
+        try:
+            assert sys.argv[0] == "--jobs"
+            jobs = int(sys.argv[1])
+            assert jobs > 0
+            del sys.argv[:2]
+        except (AssertionError, IndexError, ValueError):
+            print "Error. The jobs argument is malformed."
+            sys.exit(1)
+
+    # Ensures that the rate argument, if specified, is well-formed and valid.
+    rate = HOST_RATE_LIMIT
+
+    if "--rate" in sys.argv:
+        try:
+            assert sys.argv[0] == "--rate"
+            rate = float(sys.argv[1])
+            assert rate > 0
+            del sys.argv[:2]
+        except (AssertionError, IndexError, ValueError):
+            print "Error. The rate argument is malformed."
+            sys.exit(1)
+
+    # Ensures that the processes argument, if specified, is well-formed and valid.
+    processes = None
+
+    if "--processes" in sys.argv:
+        try:
+            assert sys.argv[0] == "--processes"
+            processes = int(sys.argv[1])
+            assert processes > 0
+            del sys.argv[:2]
+        except (AssertionError, IndexError, ValueError):
+            print "Error. The processes argument is malformed."
+            sys.exit(1)
+
     # Ensures that the log file argument is specified.
     if not sys.argv:
         print "Error. The log file argument must be specified."
         sys.exit(1)
 
-    log_path = os.path.abspath(sys.argv[0])
-
-    # Ensures that the log file path is valid (i.e. exists).
-    if not os.path.exists(log_path):
-        print "Error. Invalid path for the log file."
+    # Ensures that the log file paths are valid (i.e. exist).
+    try:
+        log_paths = expand_log_paths(sys.argv)
+    except IOError as error:
+        print "Error. Invalid path for the log file: " + str(error)
         sys.exit(1)
 
-    # Extracts the server name from the log file name.
-    try:
-        print "Extracting the server name..."
-        server_name = extract_server_name(log_path)
-    except ValueError:
-        print "Error. The log file name is malformed."
+    if not log_paths:
+        print "Error. No log files were found."
         sys.exit(1)
 
-    # Extracts the image URLs from the log file content.
-    log_file = None
+    # Extracts the server name from each log file name.
+    logs = []
+
+    print "Extracting the server names..."
+
+    for log_path in log_paths:
+        try:
+            logs.append((extract_server_name(log_path), log_path))
+        except ValueError:
+            print "Error. The log file name is malformed: " + log_path
+            sys.exit(1)
 
+    # Extracts the image URLs from the log file content, whilst scanning each log file.
     try:
-        log_file = open(log_path, "r")
-        log_content = log_file.read()
+        print "Extracting the image URLs from " + str(len(logs)) + " log file(s)..."
+        image_urls = scan_logs(logs, processes)
     except IOError:
         print "Error. Unable to open (or read) the log file."
         sys.exit(1)
-    finally:
-        if log_file:
-            log_file.close()
-
-    print "Extracting the image URLs..."
-    image_urls = extract_urls(server_name, log_content)
 
     # Ensures there are valid image URLs prior to continuing.
     if not image_urls:
@@ -178,7 +1043,7 @@ def main():
     # Downloads the images to the out path.
     try:
         print "Downloading the images..."
-        download_images(image_urls, out_path)
+        download_images(image_urls, out_path, jobs, rate)
     except requests.exceptions.ConnectionError:
         print "Error. Unable to connect to the server."
         sys.exit(1)
@@ -0,0 +1,121 @@
+"""
+Shared input layer for the 'word count' and 'mimic' exercises featured within
+Google's Python course.
+
+Files are read in chunks which end on a white-space boundary, so that no word is
+split across chunks. Regular files are memory-mapped, so that only the chunk
+being tokenized is copied into memory (rather than the entire file), whereas
+standard input (specified as '-'), pipes, and other files which can't be mapped
+fall back to buffered reads.
+"""
+
+
+import mmap
+import string
+import sys
+
+
+CHUNK_SIZE = 1024 * 1024  # Unit in bytes.
+
+
+def iter_chunks(file_path, start=0, end=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields the chunks of the file, optionally limited to the byte range between
+    the start and end offsets (which must fall on a white-space boundary).
+    """
+
+    if file_path == "-":
+        for chunk in read_chunks(sys.stdin, None, chunk_size):
+            yield chunk
+
+        return
+
+    # Opens, maps (or reads), and closes the file.
+    file = None
+    mapping = None
+
+    try:
+        file = open(file_path, "r")
+
+        # Maps the file, unless it's empty or isn't a regular file.
+        try:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (EnvironmentError, ValueError):
+            pass
+
+        if mapping:
+            for chunk in map_chunks(mapping, start, end, chunk_size):
+                yield chunk
+        else:
+            if start:
+                file.seek(start)
+
+            for chunk in read_chunks(file, None if end is None else end - start, chunk_size):
+                yield chunk
+    finally:
+        if mapping:
+            mapping.close()
+
+        if file:
+            file.close()
+
+
+def map_chunks(mapping, start=0, end=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields the chunks of the memory-mapped file between the start and end
+    offsets. Each chunk is cut after its final white-space character, and only
+    the chunk itself is copied from the mapping.
+    """
+
+    if end is None:
+        end = len(mapping)
+
+    while start < end:
+        limit = start + chunk_size
+        boundary = 0
+
+        # Locates the final white-space character within the chunk, unless the chunk reaches the end. Extends the chunk
+        # if it consists of a single (long) word.
+        while not boundary:
+            if limit >= end:
+                boundary = end
+            else:
+                boundary = max(mapping.rfind(character, start, limit) for character in string.whitespace) + 1
+                limit += chunk_size
+
+        yield mapping[start:boundary]
+
+        start = boundary
+
+
+def read_chunks(file, size=None, chunk_size=CHUNK_SIZE):
+    """
+    Reads the file (optionally limited to the specified size, in bytes) in
+    fixed-size chunks and yields each chunk up to (and including) its final
+    white-space character. The trailing partial word is carried over to the next
+    chunk, so that no word is split across chunks.
+    """
+
+    remainder = ""
+
+    while size is None or size > 0:
+        chunk = file.read(chunk_size if size is None else min(chunk_size, size))
+
+        if not chunk:
+            break
+
+        if size is not None:
+            size -= len(chunk)
+
+        chunk = remainder + chunk
+
+        # Locates the final white-space character (if any) within the chunk.
+        boundary = max(chunk.rfind(character) for character in string.whitespace) + 1
+
+        remainder = chunk[boundary:]
+
+        if boundary:
+            yield chunk[:boundary]
+
+    if remainder:
+        yield remainder
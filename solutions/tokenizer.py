@@ -0,0 +1,135 @@
+"""
+Shared tokenizer for the 'word count' and 'mimic' exercises featured within
+Google's Python course.
+
+A word is a sequence of non white-space characters which is converted to
+lowercase and stripped of leading and trailing punctuation. Rather than
+normalising each word individually, the text is converted to lowercase in a
+single pass, and (when counting) each distinct word is only stripped once.
+
+Running this module directly performs a micro-benchmark which compares the
+throughput of the batched functions against normalising each word individually,
+based on the contents of the specified file (or generated text).
+
+Usage:
+    python tokenizer.py [<file_path>]
+"""
+
+
+import collections
+import operator
+import os
+import random
+import sys
+import timeit
+
+
+PUNCTUATION = ".,:;-`'\"!?()[]"
+
+strip_punctuation = operator.methodcaller("strip", PUNCTUATION)
+
+
+def count_words(text, words=None):
+    """
+    Generates and returns a dictionary of words and associated counts based on
+    the text. Optionally accumulates into an existing dictionary.
+    """
+
+    if words is None:
+        words = {}
+
+    # Counts the lowercase words prior to stripping punctuation, so that each distinct word is only stripped once.
+    raw_words = collections.defaultdict(int)
+
+    for raw_word in text.lower().split():
+        raw_words[raw_word] += 1
+
+    for raw_word, count in raw_words.iteritems():
+        word = raw_word.strip(PUNCTUATION)
+        words[word] = words.get(word, 0) + count
+
+    return words
+
+
+def normalize(word):
+    """
+    Returns the word converted to lowercase and stripped of punctuation.
+    """
+
+    return word.lower().strip(PUNCTUATION)
+
+
+def tokenize(text):
+    """
+    Generates and returns a list of the words within the text, which are
+    converted to lowercase and stripped of punctuation.
+    """
+
+    return map(strip_punctuation, text.lower().split())
+
+
+def main():
+    """
+    Benchmarks the batched functions against normalising each word individually.
+    """
+
+    if len(sys.argv) > 2:
+        print "Error. Invalid argument count."
+        sys.exit(1)
+
+    if len(sys.argv) == 2:
+        file_path = sys.argv[1]
+
+        if not os.path.exists(file_path):
+            print "Error. Invalid file path."
+            sys.exit(1)
+
+        file = None
+
+        # Opens, reads, and closes the file.
+        try:
+            file = open(file_path, "r")
+            text = file.read()
+        except:
+            print "Error. Unable to read the file."
+            sys.exit(1)
+        finally:
+            if file:
+                file.close()
+    else:
+        # Generates text from a vocabulary with mixed letter-casing and punctuation.
+        random.seed(0)
+        vocabulary = [prefix + "word" + str(i) + suffix for i in range(5000) for prefix, suffix in [("", ""), ("(", ")."), ("Th", ",")]]
+        text = " ".join(random.choice(vocabulary) for _ in range(1000000))
+
+    def tokenize_individually():
+        return [normalize(word) for word in text.split()]
+
+    def count_individually():
+        words = {}
+
+        for word in tokenize_individually():
+            if word not in words:
+                words[word] = 0
+
+            words[word] += 1
+
+        return words
+
+    # Ensures that the normalisation semantics are identical.
+    if tokenize(text) != tokenize_individually() or count_words(text) != count_individually():
+        print "Error. The batched functions are inconsistent."
+        sys.exit(1)
+
+    token_count = len(text.split())
+
+    print "Benchmarking " + str(token_count) + " tokens..."
+
+    for name, function in [("tokenize (individually)", tokenize_individually), ("tokenize (batched)", lambda: tokenize(text)),
+                           ("count (individually)", count_individually), ("count (batched)", lambda: count_words(text))]:
+        seconds = min(timeit.repeat(function, number=1, repeat=3))
+        print "%-24s %12d tokens/second" % (name, token_count / seconds)
+
+
+if __name__ == "__main__":
+    main()